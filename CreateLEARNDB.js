@@ -20,13 +20,20 @@ db.createCollection("users", {
           bsonType: "bool",
           description: "false = Student, true = Teacher"
         },
-        followers: {
+        followersCount: {
+          bsonType: "int",
+          description: "Contador; las relaciones viven en la colección follows"
+        },
+        followingCount: { bsonType: "int" },
+        searchTokens: {
           bsonType: "array",
-          items: { bsonType: "objectId" }
+          description: "Palabras del nombre en minúsculas y sin acentos (búsqueda por prefijo)",
+          items: { bsonType: "string" }
         },
-        following: {
+        searchGrams: {
           bsonType: "array",
-          items: { bsonType: "objectId" }
+          description: "Trigramas de searchTokens (búsqueda tolerante a errores)",
+          items: { bsonType: "string" }
         },
         information: {
           bsonType: "object",
@@ -59,6 +66,21 @@ db.createCollection("users", {
   }
 });
 
+// 1.1 Create follows collection (grafo de seguidores)
+db.createCollection("follows", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["follower", "followee", "createdAt"],
+      properties: {
+        follower: { bsonType: "objectId", description: "Usuario que sigue" },
+        followee: { bsonType: "objectId", description: "Usuario seguido" },
+        createdAt: { bsonType: "date" }
+      }
+    }
+  }
+});
+
 // 2. Create achievements collection
 db.createCollection("achievements", {
   validator: {
@@ -91,6 +113,17 @@ db.createCollection("news", {
         description: { bsonType: "string" },
         likes: { bsonType: "int" },
         date: { bsonType: "date" },
+        commentCount: { bsonType: "int" },
+        lastComment: {
+          bsonType: ["object", "null"],
+          description: "Último comentario desnormalizado"
+        },
+        kind: {
+          bsonType: "string",
+          description: "Noticias automáticas: activity, unsubscribe, achievement"
+        },
+        courseId: { bsonType: "objectId" },
+        activityCount: { bsonType: "int" },
         comments: {
           bsonType: "array",
           items: {
@@ -109,6 +142,22 @@ db.createCollection("news", {
   }
 });
 
+// 3.1 Create news comments collection (comentarios fuera del documento de la noticia)
+db.createCollection("newsComments", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["newsId", "comment", "userId", "date"],
+      properties: {
+        newsId: { bsonType: "objectId" },
+        comment: { bsonType: "string" },
+        userId: { bsonType: "objectId" },
+        date: { bsonType: "date" }
+      }
+    }
+  }
+});
+
 // 4. Create courses collection
 db.createCollection("courses", {
   validator: {
@@ -230,6 +279,11 @@ db.createCollection("forums", {
           description: "URL del video (opcional)"
         },
         creationDate: { bsonType: "date" },
+        commentCount: { bsonType: "int" },
+        lastComment: {
+          bsonType: ["object", "null"],
+          description: "Último comentario desnormalizado (incluye userName)"
+        },
         comments: {
           bsonType: "array",
           items: {
@@ -252,6 +306,43 @@ db.createCollection("forums", {
   }
 });
 
+// 6.1 Create forum comments collection (comentarios fuera del documento del foro)
+db.createCollection("forumComments", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["forumId", "userId", "content", "date"],
+      properties: {
+        forumId: { bsonType: "objectId" },
+        lessonId: { bsonType: "objectId" },
+        userId: { bsonType: "objectId" },
+        content: { bsonType: "string" },
+        videoURL: {
+          bsonType: ["string", "null"],
+          description: "URL del video (opcional)"
+        },
+        date: { bsonType: "date" }
+      }
+    }
+  }
+});
+
+// 6.2 Create timelines collection (fan-out on write del feed de noticias)
+db.createCollection("timelines", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["userId", "newsId", "authorId", "date"],
+      properties: {
+        userId: { bsonType: "objectId", description: "Dueño del feed" },
+        newsId: { bsonType: "objectId" },
+        authorId: { bsonType: "objectId" },
+        date: { bsonType: "date" }
+      }
+    }
+  }
+});
+
 // 7. Create teacher statistics collection (modificado: campos directos sin generalStatistics)
 db.createCollection("teacherStatistics", {
   validator: {
@@ -268,6 +359,60 @@ db.createCollection("teacherStatistics", {
   }
 });
 
+// 9. Create studentStatistics collection (modelo de lectura del perfil, uno por usuario y lengua)
+db.createCollection("studentStatistics", {
+  validator: {
+    $jsonSchema: {
+      bsonType: "object",
+      required: ["userId", "language"],
+      properties: {
+        userId: { bsonType: "objectId" },
+        language: { bsonType: "bool", description: "false = LESCO, true = LIBRAS" },
+        courses: {
+          bsonType: "object",
+          description: "Aporte de cada curso inscrito, por courseId"
+        },
+        totals: { bsonType: "object" },
+        updatedAt: { bsonType: "date" }
+      }
+    }
+  }
+});
+
+// Índices: la lista completa está declarada en routes/indexes.py; el backend
+// crea los que falten al arrancar (o con `flask indexes ensure`).
 db.users.createIndex({ firebaseUid: 1 }, { unique: true });
+db.studentStatistics.createIndex({ userId: 1, language: 1 }, { unique: true });
+db.users.createIndex({ searchTokens: 1 });
+db.users.createIndex({ searchGrams: 1 });
+db.follows.createIndex({ follower: 1, followee: 1 }, { unique: true });
+db.follows.createIndex({ followee: 1, follower: 1 }, { unique: true });
+db.follows.createIndex({ followee: 1, createdAt: -1, _id: -1 });
+db.follows.createIndex({ follower: 1, createdAt: -1, _id: -1 });
+db.forums.createIndex({ lessonId: 1, creationDate: -1, _id: -1 });
+db.forumComments.createIndex({ forumId: 1, date: 1, _id: 1 });
+// Búsqueda de texto en el foro (posts y comentarios)
+db.forums.createIndex({ content: "text" }, { default_language: "spanish" });
+db.forumComments.createIndex({ content: "text" }, { default_language: "spanish" });
+db.timelines.createIndex({ userId: 1, date: -1, newsId: -1 });
+db.news.createIndex({ userId: 1, date: -1, _id: -1 });
+db.news.createIndex({ userId: 1, courseId: 1, kind: 1, date: -1 }, { partialFilterExpression: { kind: "activity" } });
+db.timelines.createIndex({ userId: 1, newsId: 1 }, { unique: true });
+db.timelines.createIndex({ userId: 1, authorId: 1 });
+db.news_likes.createIndex({ newsId: 1, userId: 1 }, { unique: true });
+db.newsComments.createIndex({ newsId: 1, date: -1, _id: -1 });
+db.news.createIndex({ kind: 1, date: 1 }, { partialFilterExpression: { kind: { $exists: true } } });
+db.newsArchive.createIndex({ userId: 1, date: -1 });
+db.enrolledCourses.createIndex({ userId: 1, courseId: 1 });
+db.enrolledCourses.createIndex({ courseId: 1, userId: 1 });
+db.newsLikesArchive.createIndex({ newsId: 1 });
+db.newsCommentsArchive.createIndex({ newsId: 1 });
+db.news_likes.createIndex({ userId: 1, newsId: 1 });
+db.courses.createIndex({ "lessons._id": 1 });
+db.courses.createIndex({ userId: 1, language: 1 });
+db.courses.createIndex({ status: 1, language: 1 });
+db.achievements.createIndex({ type: 1, name: 1, content: 1 });
+db.teacherStatistics.createIndex({ userId: 1 });
+db.events.createIndex({ date: 1 }, { expireAfterSeconds: 3600 });
 
 print("\nCollections created successfully!");
\ No newline at end of file
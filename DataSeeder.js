@@ -4,6 +4,8 @@
 // 3. Connect to your server
 // 4. Open MONGOSH tab
 // 5. Copy and paste all this code in the mongosh console
+// 6. From the backend folder run `flask user rebuild-search-keys` so the
+//    seeded users show up in /api/profile/search
 
 print("Iniciando seed de la base de datos LEARN...\n");
 
@@ -17,8 +19,8 @@ const student = {
   firebaseUid: "firebase_uid_student_maria_001",
   type: false, // Estudiante
   name: "María Badilla Castro",
-  followers: [], // Se llenará después
-  following: [], // Se llenará después
+  followersCount: NumberInt(1), // Relaciones en la colección follows
+  followingCount: NumberInt(1),
   information: {
     streak: {
       current: NumberInt(7),
@@ -41,8 +43,8 @@ const teacher = {
   firebaseUid: "firebase_uid_teacher_sofia_002",
   type: true, // Profesor
   name: "Sofia Castro Álvarez",
-  followers: [studentId], // El estudiante sigue al profesor
-  following: [studentId], // El profesor sigue al estudiante
+  followersCount: NumberInt(1), // El estudiante sigue al profesor
+  followingCount: NumberInt(1), // El profesor sigue al estudiante
   information: {
     streak: {
       current: NumberInt(30),
@@ -65,8 +67,8 @@ const newUser = {
   firebaseUid: "firebase_uid_student_carlos_003",
   type: false, // Estudiante
   name: "Carlos Rodríguez Pérez",
-  followers: [], // Array vacío - sin seguidores
-  following: [], // Array vacío - no sigue a nadie
+  followersCount: NumberInt(0), // Sin seguidores
+  followingCount: NumberInt(0), // No sigue a nadie
   information: {
     streak: {
       current: NumberInt(0), // Nueva racha
@@ -83,16 +85,11 @@ const newUser = {
 const newUserId = db.users.insertOne(newUser).insertedId;
 print(`Usuario nuevo creado: ${newUserId}\n`);
 
-// Actualizar followers/following del estudiante
-db.users.updateOne(
-  { _id: studentId },
-  { 
-    $set: { 
-      followers: [teacherId],
-      following: [teacherId]
-    }
-  }
-);
+// Relaciones de seguimiento (estudiante <-> profesor)
+db.follows.insertMany([
+  { follower: studentId, followee: teacherId, createdAt: new Date() },
+  { follower: teacherId, followee: studentId, createdAt: new Date() }
+]);
 print("Relaciones followers/following establecidas\n");
 
 // ========================================
@@ -380,17 +377,17 @@ const newsPost = {
   description: "¡Estoy emocionada por aprender más!",
   likes: NumberInt(5),
   date: new Date("2025-10-15"),
-  comments: [
-    {
-      _id: new ObjectId(),
-      comment: "¡Excelente trabajo María!",
-      userId: teacherId,
-      date: new Date("2025-10-15")
-    }
-  ]
+  commentCount: NumberInt(1),
+  lastComment: {
+    _id: new ObjectId(),
+    comment: "¡Excelente trabajo María!",
+    userId: teacherId,
+    date: new Date("2025-10-15")
+  }
 };
 
 const newsId = db.news.insertOne(newsPost).insertedId;
+db.newsComments.insertOne({ ...newsPost.lastComment, newsId: newsId });
 print(`Publicación creada: ${newsId}\n`);
 
 // ========================================
@@ -398,24 +395,27 @@ print(`Publicación creada: ${newsId}\n`);
 // ========================================
 print("Creando post en foro...");
 
+const forumComment = {
+  _id: new ObjectId(),
+  userId: teacherId,
+  content: "Claro María. Los saludos formales se usan en contextos profesionales, mientras que los informales son para amigos y familia.",
+  videoURL: "https://example.com/respuesta-video.mp4",  // Agregado
+  date: new Date("2025-10-13")
+};
+
 const forumPost = {
   lessonId: lessonId,
   userId: studentId,
   content: "¿Alguien puede explicarme mejor la diferencia entre los saludos formales e informales?",
   videoURL: "https://example.com/video-tutorial.mp4",  // Agregado
   creationDate: new Date("2025-10-13"),
-  comments: [
-    {
-      _id: new ObjectId(),
-      userId: teacherId,
-      content: "Claro María. Los saludos formales se usan en contextos profesionales, mientras que los informales son para amigos y familia.",
-      videoURL: "https://example.com/respuesta-video.mp4",  // Agregado
-      date: new Date("2025-10-13")
-    }
-  ]
+  // Datos desnormalizados; los comentarios van en forumComments
+  commentCount: NumberInt(1),
+  lastComment: { ...forumComment, userName: teacher.name }
 };
 
 const forumId = db.forums.insertOne(forumPost).insertedId;
+db.forumComments.insertOne({ ...forumComment, forumId: forumId, lessonId: lessonId });
 print(`Post de foro creado: ${forumId}\n`);
 
 // ========================================
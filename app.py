@@ -1,6 +1,6 @@
-from flask import Flask, request, current_app, jsonify
+from flask import Flask, Response, request, current_app, jsonify
 from flask_cors import CORS
-from pymongo import MongoClient
+from pymongo import MongoClient, timeout
 
 from routes.user import user_blueprint
 from routes.teacherCourses import teacher_courses_blueprint  
@@ -12,21 +12,80 @@ from routes.coursesStudent import coursesStudent_blueprint
 from routes.lessonsStudent import lessonsStudent_blueprint
 from routes.homeStudent import homeStudent_blueprint
 from routes.forum import forum_blueprint
+from routes.events import events_bp, init_app as init_events
+from routes.retention import init_app as init_retention
+from routes.suggestions import init_app as init_suggestions
+from routes.userSearch import init_app as init_user_search
+from routes.indexes import init_app as init_indexes
+from routes.migrations import init_app as init_migrations
+from routes.benchmark import bench_cli
+from routes.metrics import command_listener, pool_listener, render_metrics, init_app as init_metrics
 
 app = Flask(__name__)
 
 #Variable global para definir el lenguaje por defecto
 app.config['LESCO'] = True
 
+# Backend de eventos en tiempo real: 'memory' (un worker) o 'mongo' (change streams, varios workers)
+app.config['EVENTS_BACKEND'] = 'memory'
+
+# Minutos en los que los resultados de lecciones de un mismo curso se agrupan en una sola noticia
+app.config['NEWS_ACTIVITY_WINDOW_MINUTES'] = 60
+
+# Retención: las noticias automáticas con más de estos días pasan a newsArchive.
+# Con NEWS_ARCHIVE_INTERVAL_HOURS en 0 solo se archiva con `flask news archive`
+app.config['NEWS_RETENTION_DAYS'] = 90
+app.config['NEWS_ARCHIVE_INTERVAL_HOURS'] = 0
+
+# Horas entre recálculos de sugerencias de amigos (0 = solo con `flask user compute-suggestions`)
+app.config['FRIEND_SUGGESTIONS_INTERVAL_HOURS'] = 0
+
+# Segundos en los que /sync-user no vuelve a escribir lastConnection del mismo usuario
+app.config['LAST_CONNECTION_WINDOW_SECONDS'] = 300
+
+# Calcular al arrancar (en segundo plano) las claves de búsqueda de usuarios que no las tengan
+app.config['SEARCH_KEYS_BACKFILL_ON_STARTUP'] = True
+
+# Correr al arrancar (en segundo plano, una sola vez por base) las migraciones
+# de datos de routes/migrations.py que falten
+app.config['RUN_MIGRATIONS_ON_STARTUP'] = True
+
+# Crear al arrancar (en segundo plano) los índices de routes/indexes.py que falten
+app.config['ENSURE_INDEXES_ON_STARTUP'] = True
+
+# Veces que la misma consulta puede repetirse en un request antes de avisar (N+1)
+app.config['DB_REPEATED_QUERY_THRESHOLD'] = 10
+
 # conexion a MongoDB, ajustar según sea necesario cada uno localmente
 # (luego Jhon lo desplegará en la nube) 
-client = MongoClient('mongodb://localhost:27017/')
+client = MongoClient('mongodb://localhost:27017/', event_listeners=[command_listener, pool_listener])
 db = client['LEARN']
 app.db = db
 
 # Habilitamos CORS para integrarlo con el frontend
 CORS(app)
 
+# Métricas por request: latencia, errores, consultas a MongoDB y aviso de N+1
+init_metrics(app)
+
+# Índices que necesitan las consultas (y comandos `flask indexes ...`)
+init_indexes(app)
+
+# Migraciones de datos pendientes (seguidores, timelines, estadísticas)
+init_migrations(app)
+
+# Pub/sub de eventos para el stream SSE
+init_events(app)
+
+# Archivado periódico de noticias antiguas (si está habilitado)
+init_retention(app)
+
+# Claves de búsqueda por nombre de usuarios que aún no las tienen
+init_user_search(app)
+
+# Recálculo periódico de sugerencias de amigos (si está habilitado)
+init_suggestions(app)
+
 # Habilitamos las rutas
 app.register_blueprint(auth_blueprint, url_prefix='/api/auth')
 app.register_blueprint(user_blueprint, url_prefix='/api/profile')
@@ -39,6 +98,10 @@ app.register_blueprint(coursesStudent_blueprint, url_prefix='/api')
 app.register_blueprint(lessonsStudent_blueprint, url_prefix='/api')
 app.register_blueprint(homeStudent_blueprint, url_prefix='/api')
 app.register_blueprint(forum_blueprint, url_prefix='/api/forum')
+app.register_blueprint(events_bp, url_prefix='/api/events')
+
+# Benchmark de endpoints (`flask bench seed` / `flask bench run`)
+app.cli.add_command(bench_cli)
 
 
 
@@ -47,6 +110,21 @@ app.register_blueprint(forum_blueprint, url_prefix='/api/forum')
 def health():
     return {'status': 'ok'}, 200
 
+# Listo para recibir tráfico: la base de datos responde
+@app.route('/ready')
+def ready():
+    try:
+        with timeout(2):
+            current_app.db.command('ping')
+        return {'status': 'ready'}, 200
+    except Exception as e:
+        return {'status': 'unavailable', 'error': str(e)}, 503
+
+# Métricas en formato de texto de Prometheus
+@app.route('/metrics')
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 # Endpoint para alternar el valor de LESCO dependiendo del valor que se le de
 @app.route('/api/language', methods=['POST'])
 def set_lesco():
@@ -1,9 +1,114 @@
 from flask import Blueprint, jsonify, current_app, request
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from routes.background import BatchWorker
+from routes.cache import TTLCache
+from routes.userSearch import search_keys
 
 auth_blueprint = Blueprint('auth', __name__)
 
+# ============================
+# firebaseUid -> (userId, type)
+# ============================
+# Cache por proceso para no ir a Mongo en cada pantalla. Los uid que no
+# existen también se guardan (menos tiempo) para cortar reintentos.
+# Crear un usuario o cambiar su type debe llamar a invalidate_firebase_uid().
+
+_UID_CACHE = TTLCache('firebase_uids', maxsize=50000, ttl=600)
+_UID_NEGATIVE_TTL = 30
+_NOT_FOUND = object()
+
+def resolve_firebase_uid(db, firebase_uid):
+    """Devuelve (ObjectId, type) del usuario o None si no existe."""
+    cached = _UID_CACHE.get(firebase_uid)
+    if cached is not None:
+        return None if cached is _NOT_FOUND else cached
+    user = db.users.find_one({'firebaseUid': firebase_uid}, {'type': 1})
+    if not user:
+        _UID_CACHE.set(firebase_uid, _NOT_FOUND, ttl=_UID_NEGATIVE_TTL)
+        return None
+    entry = (user['_id'], user.get('type', False))
+    _UID_CACHE.set(firebase_uid, entry)
+    return entry
+
+def invalidate_firebase_uid(firebase_uid):
+    _UID_CACHE.invalidate(firebase_uid)
+
+def resolve_user_id(db, value):
+    """
+    Acepta un ObjectId de Mongo o un Firebase uid y devuelve el ObjectId del
+    usuario (None si el uid no existe). Pensado para que las rutas o un
+    middleware de auth reciban el uid directamente.
+    """
+    if isinstance(value, ObjectId):
+        return value
+    if ObjectId.is_valid(value):
+        return ObjectId(value)
+    entry = resolve_firebase_uid(db, value)
+    return entry[0] if entry else None
+
+# ============================
+# lastConnection en diferido
+# ============================
+# Solo se escribe si el valor guardado es más viejo que
+# LAST_CONNECTION_WINDOW_SECONDS, y se hace en lote desde un BatchWorker:
+# varias aperturas del mismo usuario dentro del lote quedan en una sola escritura.
+
+def _flush_last_connections(batch):
+    db = batch[0][0]
+    latest = {}
+    for _, user_oid, when in batch:
+        if when > latest.get(user_oid, when.min):
+            latest[user_oid] = when
+    db.users.bulk_write([
+        UpdateOne({'_id': user_oid}, {'$max': {'information.streak.lastConnection': when}})
+        for user_oid, when in latest.items()
+    ], ordered=False)
+
+_LAST_CONNECTION_WORKER = BatchWorker('last-connection', _flush_last_connections, batch_size=500, interval=2.0)
+
+def _new_user_doc(user_oid, firebase_uid, now):
+    # sin nombre todavía: las claves de búsqueda se calculan cuando lo tenga
+    return {
+        '_id': user_oid,
+        'firebaseUid': firebase_uid,
+        'type': False,  # false = estudiante (por defecto)
+        'followersCount': 0,
+        'followingCount': 0,
+        'information': {
+            'streak': {
+                'current': 0,
+                'lastConnection': now
+            },
+            'achievements': [],
+            'lescoSkills': 0,
+            'librasSkills': 0,
+            'lescoLevel': 0,
+            'librasLevel': 0,
+            'myCourses': []
+        }
+    }
+
+def _upsert_user(db, firebase_uid, new_user):
+    for attempt in (1, 2):
+        try:
+            return db.users.find_one_and_update(
+                {'firebaseUid': firebase_uid},
+                {'$setOnInsert': new_user},
+                projection={
+                    'type': 1, 'information.streak.lastConnection': 1,
+                    'name': 1, 'firstName': 1, 'lastName': 1, 'searchTokens': 1
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Dos sync simultáneos del mismo usuario nuevo: el segundo lo encuentra al reintentar
+            if attempt == 2:
+                raise
+
 @auth_blueprint.route('/sync-user', methods=['POST'])
 def sync_firebase_user():
     """
@@ -27,60 +132,38 @@ def sync_firebase_user():
         if not firebase_uid:
             return jsonify({'error': 'Se requiere uid'}), 400
         
-        # Buscar si el usuario ya existe por firebaseUid
-        existing_user = db.users.find_one({'firebaseUid': firebase_uid})
+        # Buscar o crear en una sola operación: si no existe se inserta con el
+        # _id generado aquí, así se sabe si el usuario es nuevo
+        now = datetime.now()
+        new_id = ObjectId()
+        user = _upsert_user(db, firebase_uid, _new_user_doc(new_id, firebase_uid, now))
+        is_new = (user['_id'] == new_id)
         
-        if existing_user:
-            # Usuario existe - actualizar lastConnection en el streak
-            db.users.update_one(
-                {'_id': existing_user['_id']},
-                {'$set': {'information.streak.lastConnection': datetime.now()}}
-            )
+        # Reemplaza una posible entrada negativa del uid
+        _UID_CACHE.set(firebase_uid, (user['_id'], user.get('type', False)))
+        
+        if not is_new:
+            # Usuario existe - actualizar lastConnection solo si quedó viejo (en diferido)
+            window = timedelta(seconds=current_app.config.get('LAST_CONNECTION_WINDOW_SECONDS', 300))
+            last = ((user.get('information') or {}).get('streak') or {}).get('lastConnection')
+            if not last or now - last >= window:
+                _LAST_CONNECTION_WORKER.submit((db, user['_id'], now))
             
-            return jsonify({
-                'message': 'Usuario sincronizado exitosamente',
-                'userId': str(existing_user['_id']),
-                'isNewUser': False,
-                'user': {
-                    'id': str(existing_user['_id']),
-                    'firebaseUid': firebase_uid,
-                    'type': existing_user.get('type', False)
-                }
-            }), 200
+            # El nombre se escribe fuera de la API: calcular las claves de búsqueda si faltan
+            keys = search_keys(user)
+            if keys['searchTokens'] and not user.get('searchTokens'):
+                db.users.update_one({'_id': user['_id']}, {'$set': keys})
         
-        else:
-            # Usuario no existe - crear nuevo con type automáticamente en false
-            new_user = {
+        return jsonify({
+            'message': 'Usuario creado exitosamente' if is_new else 'Usuario sincronizado exitosamente',
+            'userId': str(user['_id']),
+            'isNewUser': is_new,
+            'user': {
+                'id': str(user['_id']),
                 'firebaseUid': firebase_uid,
-                'type': False,  # false = estudiante (por defecto)
-                'followers': [],
-                'following': [],
-                'information': {
-                    'streak': {
-                        'current': 0,
-                        'lastConnection': datetime.now()
-                    },
-                    'achievements': [],
-                    'lescoSkills': 0,
-                    'librasSkills': 0,
-                    'lescoLevel': 0,
-                    'librasLevel': 0,
-                    'myCourses': []
-                }
+                'type': user.get('type', False)
             }
-            
-            result = db.users.insert_one(new_user)
-            
-            return jsonify({
-                'message': 'Usuario creado exitosamente',
-                'userId': str(result.inserted_id),
-                'isNewUser': True,
-                'user': {
-                    'id': str(result.inserted_id),
-                    'firebaseUid': firebase_uid,
-                    'type': False
-                }
-            }), 201
+        }), 201 if is_new else 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -94,15 +177,16 @@ def get_user_by_firebase_uid(firebase_uid):
     try:
         db = current_app.db
         
-        user = db.users.find_one({'firebaseUid': firebase_uid})
+        entry = resolve_firebase_uid(db, firebase_uid)
         
-        if not user:
+        if not entry:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
+        user_oid, user_type = entry
         return jsonify({
-            'userId': str(user['_id']),
-            'firebaseUid': user.get('firebaseUid'),
-            'type': user.get('type', False)
+            'userId': str(user_oid),
+            'firebaseUid': firebase_uid,
+            'type': user_type
         }), 200
         
     except Exception as e:
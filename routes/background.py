@@ -0,0 +1,70 @@
+import atexit
+import logging
+import queue
+import threading
+
+# ============================
+# Trabajo en segundo plano por lotes
+# ============================
+# Un hilo daemon por worker que junta lo encolado y lo entrega al handler
+# en lotes (hasta batch_size elementos o lo acumulado en `interval` segundos).
+# Lo pendiente se procesa también al terminar el proceso.
+
+class BatchWorker:
+    def __init__(self, name, handler, batch_size=100, interval=1.0):
+        self.name = name
+        self._handler = handler
+        self._batch_size = batch_size
+        self._interval = interval
+        self._queue = queue.Queue()
+        self._logger = logging.getLogger(f"routes.background.{name}")
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def submit(self, item):
+        self._ensure_started()
+        self._queue.put(item)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Procesa en el hilo actual todo lo que quede en la cola."""
+        batch = self._drain(block=False)
+        while batch:
+            self._process(batch)
+            batch = self._drain(block=False)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"batch-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _drain(self, block=True):
+        batch = []
+        try:
+            batch.append(self._queue.get(block=block, timeout=self._interval if block else None))
+        except queue.Empty:
+            return batch
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch):
+        try:
+            self._handler(batch)
+        except Exception:
+            self._logger.exception(f"[{self.name}] error procesando lote de {len(batch)}")
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            if batch:
+                self._process(batch)
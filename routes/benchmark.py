@@ -0,0 +1,512 @@
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from bson import ObjectId
+from flask import current_app
+from flask.cli import AppGroup
+from routes.indexes import ensure_indexes
+from routes.studentStatistics import rebuild_student_statistics
+from routes.suggestions import compute_friend_suggestions
+from routes.timeline import BACKFILL_LIMIT
+from routes.userSearch import search_keys
+
+# ============================
+# Benchmark de endpoints
+# ============================
+# `flask bench seed` genera un dataset sintético reproducible (misma --seed,
+# mismos datos) en una base aparte (LEARN_BENCH por defecto) con insert_many
+# por lotes, y deriva timelines, estadísticas, sugerencias e índices con las
+# mismas funciones que usa la app.
+# `flask bench run` recorre los endpoints con varios hilos, por el test client
+# de Flask (la app apunta a la base de benchmark mientras dura la corrida) o
+# contra un servidor real con --base-url (que debe estar usando esa base), y
+# guarda p50/p95/p99 y throughput por endpoint en un JSON para comparar corridas.
+# Los percentiles y el throughput son solo de respuestas 2xx; el resto cuenta
+# como error.
+#
+# Quedan fuera el stream SSE y las rutas que borran o reescriben cursos
+# completos (DELETE/PUT teacher-courses, DELETE course-students, unenroll).
+
+BENCH_DB = "LEARN_BENCH"
+INSERT_CHUNK = 1000
+SAMPLE_SIZE = 200   # ids de cada colección que se usan para armar requests
+
+_FIRST = ["María", "José", "Ana", "Luis", "Sofía", "Carlos", "Lucía", "Jorge", "Elena", "Andrés",
+          "Valeria", "Diego", "Camila", "Pablo", "Daniela", "Mateo", "Paula", "Felipe", "Laura", "Tomás"]
+_LAST = ["Badilla", "Castro", "Álvarez", "Rodríguez", "Pérez", "Mora", "Jiménez", "Vargas", "Rojas",
+         "Solano", "Araya", "Chaves", "Quesada", "Núñez", "Salas", "Brenes", "Calderón", "Vega"]
+_WORDS = ["seña", "saludo", "mano", "lección", "práctica", "número", "familia", "color", "día",
+          "pregunta", "respuesta", "curso", "ejercicio", "video", "gracias", "ayuda", "duda", "clase"]
+
+def _text(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize()
+
+def _insert(db, name, docs):
+    for i in range(0, len(docs), INSERT_CHUNK):
+        db[name].insert_many(docs[i:i + INSERT_CHUNK], ordered=False)
+    return len(docs)
+
+def seed_dataset(db, users, teachers, courses, lessons, exercises, enrollments, follows,
+                 news, likes, comments, forums, seed=42):
+    """Borra y genera el dataset de benchmark. Devuelve {colección: documentos}."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def past(days):
+        return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+
+    # usuarios (los primeros `teachers` son profesores)
+    user_docs = []
+    for i in range(users):
+        name = f"{rng.choice(_FIRST)} {rng.choice(_LAST)} {rng.choice(_LAST)}"
+        doc = {
+            "_id": ObjectId(),
+            "firebaseUid": f"bench_uid_{i}",
+            "type": i < teachers,
+            "name": name,
+            "followersCount": 0,
+            "followingCount": 0,
+            "information": {
+                "streak": {"current": rng.randint(0, 30), "lastConnection": past(30)},
+                "achievements": [],
+                "lescoSkills": rng.randint(0, 50), "librasSkills": rng.randint(0, 50),
+                "lescoLevel": rng.randint(1, 10), "librasLevel": rng.randint(1, 10),
+                "myCourses": []
+            }
+        }
+        doc.update(search_keys(doc))
+        user_docs.append(doc)
+    teacher_ids = [u["_id"] for u in user_docs[:teachers]] or [user_docs[0]["_id"]]
+    by_id = {u["_id"]: u for u in user_docs}
+
+    # seguimientos
+    follow_docs = []
+    following = {}
+    for u in user_docs:
+        targets = rng.sample(user_docs, min(follows, users - 1))
+        for t in targets:
+            if t["_id"] == u["_id"]:
+                continue
+            following.setdefault(u["_id"], []).append(t["_id"])
+            follow_docs.append({"follower": u["_id"], "followee": t["_id"], "createdAt": past(90)})
+            u["followingCount"] += 1
+            t["followersCount"] += 1
+
+    # cursos con lecciones y ejercicios
+    course_docs = []
+    for c in range(courses):
+        lesson_docs = []
+        for l in range(lessons):
+            exercise_docs = []
+            for e in range(exercises):
+                answers = [_text(rng, 1) for _ in range(4)]
+                exercise_docs.append({
+                    "_id": ObjectId(), "exerciseType": 1, "order": e + 1, "sign": ObjectId(),
+                    "question": _text(rng, 6) + "?", "possibleAnswers": answers,
+                    "correctAnswer": [rng.choice(answers)]
+                })
+            lesson_docs.append({
+                "_id": ObjectId(), "order": l + 1, "name": _text(rng, 3),
+                "questionCount": exercises, "attempts": 3, "forumEnabled": True,
+                "theory": [{"text": _text(rng, 12), "sign": ObjectId()}],
+                "exercises": exercise_docs
+            })
+        course_docs.append({
+            "_id": ObjectId(), "userId": rng.choice(teacher_ids), "name": _text(rng, 3),
+            "description": _text(rng, 10), "difficulty": rng.randint(1, 3),
+            "language": rng.random() < 0.5, "status": rng.random() < 0.9,
+            "students": [], "lessons": lesson_docs
+        })
+
+    # inscripciones con progreso parcial
+    enrollment_docs = []
+    public = [c for c in course_docs if c["status"]] or course_docs
+    for u in user_docs[teachers:]:
+        for course in rng.sample(public, min(enrollments, len(public))):
+            done = rng.randint(0, len(course["lessons"]))
+            enrollment_docs.append({
+                "userId": u["_id"], "courseId": course["_id"],
+                "completionDate": past(30) if done == len(course["lessons"]) and done else None,
+                "completedLessons": [
+                    {"_id": ObjectId(), "lessonId": l["_id"], "correctCount": rng.randint(0, exercises),
+                     "remainingAttempts": rng.randint(0, 2), "completionDate": past(60)}
+                    for l in course["lessons"][:done]
+                ]
+            })
+            u["information"]["myCourses"].append(course["_id"])
+            course["students"].append(u["_id"])
+
+    # noticias, likes y comentarios
+    news_docs, like_docs, comment_docs = [], [], []
+    for u in user_docs:
+        for _ in range(news):
+            doc = {"_id": ObjectId(), "userId": u["_id"], "title": _text(rng, 5), "description": _text(rng, 12),
+                   "date": past(60), "likes": 0, "commentCount": 0, "lastComment": None}
+            for liker in rng.sample(user_docs, min(rng.randint(0, likes * 2), users)):
+                like_docs.append({"newsId": doc["_id"], "userId": liker["_id"], "createdAt": past(30)})
+                doc["likes"] += 1
+            for _ in range(rng.randint(0, comments * 2)):
+                comment = {"_id": ObjectId(), "newsId": doc["_id"], "userId": rng.choice(user_docs)["_id"],
+                           "comment": _text(rng, 8), "date": past(30)}
+                comment_docs.append(comment)
+                doc["commentCount"] += 1
+                if doc["lastComment"] is None or comment["date"] > doc["lastComment"]["date"]:
+                    doc["lastComment"] = {k: v for k, v in comment.items() if k != "newsId"}
+            news_docs.append(doc)
+
+    # timelines: propias + últimas BACKFILL_LIMIT de cada seguido
+    by_author = {}
+    for n in sorted(news_docs, key=lambda n: n["date"], reverse=True):
+        by_author.setdefault(n["userId"], []).append(n)
+    timeline_docs = [
+        {"userId": u["_id"], "newsId": n["_id"], "authorId": author, "date": n["date"]}
+        for u in user_docs
+        for author in following.get(u["_id"], []) + [u["_id"]]
+        for n in by_author.get(author, [])[:BACKFILL_LIMIT]
+    ]
+
+    # foros por lección
+    forum_docs, forum_comment_docs = [], []
+    for course in course_docs:
+        members = course["students"] + [course["userId"]]
+        for lesson in course["lessons"]:
+            for _ in range(forums):
+                forum = {"_id": ObjectId(), "lessonId": lesson["_id"], "userId": rng.choice(members),
+                         "content": _text(rng, 15), "videoURL": None, "creationDate": past(60),
+                         "commentCount": 0, "lastComment": None}
+                for _ in range(rng.randint(0, comments * 2)):
+                    author = rng.choice(members)
+                    comment = {"_id": ObjectId(), "forumId": forum["_id"], "lessonId": lesson["_id"],
+                               "userId": author, "content": _text(rng, 10), "videoURL": None, "date": past(30)}
+                    forum_comment_docs.append(comment)
+                    forum["commentCount"] += 1
+                    if forum["lastComment"] is None or comment["date"] > forum["lastComment"]["date"]:
+                        forum["lastComment"] = {**{k: v for k, v in comment.items() if k not in ("forumId", "lessonId")},
+                                                "userName": by_id[author]["name"]}
+                forum_docs.append(forum)
+
+    achievement_docs = [
+        {"name": f"{kind} {n}", "type": language, "content": f"{kind} {n}.", "date": now}
+        for language in (False, True)
+        for kind in ("¡Nivel", "cursos completados", "logros conseguidos")
+        for n in (10, 25, 50, 100)
+    ]
+    teacher_stat_docs = [
+        {"userId": t, "coursesCreated": sum(1 for c in course_docs if c["userId"] == t),
+         "lessonsCreated": sum(len(c["lessons"]) for c in course_docs if c["userId"] == t),
+         "totalStudents": sum(len(c["students"]) for c in course_docs if c["userId"] == t)}
+        for t in teacher_ids
+    ]
+
+    counts = {
+        "users": _insert(db, "users", user_docs),
+        "follows": _insert(db, "follows", follow_docs),
+        "courses": _insert(db, "courses", course_docs),
+        "enrolledCourses": _insert(db, "enrolledCourses", enrollment_docs),
+        "news": _insert(db, "news", news_docs),
+        "news_likes": _insert(db, "news_likes", like_docs),
+        "newsComments": _insert(db, "newsComments", comment_docs),
+        "timelines": _insert(db, "timelines", timeline_docs),
+        "forums": _insert(db, "forums", forum_docs),
+        "forumComments": _insert(db, "forumComments", forum_comment_docs),
+        "achievements": _insert(db, "achievements", achievement_docs),
+        "teacherStatistics": _insert(db, "teacherStatistics", teacher_stat_docs),
+    }
+
+    # modelos derivados con las mismas funciones de la app
+    ensure_indexes(db)
+    counts["studentStatistics"] = rebuild_student_statistics(db)
+    counts["friendSuggestions"] = compute_friend_suggestions(db)
+    return counts
+
+# ============================
+# Escenarios
+# ============================
+
+def _sample(db, name, query, projection, size=SAMPLE_SIZE):
+    return list(db[name].aggregate([{"$match": query}, {"$sample": {"size": size}}, {"$project": projection}]))
+
+def build_scenarios(db):
+    """
+    {nombre: fn(rng) -> (método, url, body, seguimiento)} donde seguimiento es
+    None o fn(respuesta) -> request sin medir (por ejemplo cancelar una corrida).
+    """
+    students = _sample(db, "users", {"type": False}, {"firebaseUid": 1})
+    teachers = _sample(db, "users", {"type": True}, {"_id": 1})
+    courses = _sample(db, "courses", {}, {"userId": 1, "lessons._id": 1, "lessons.exercises._id": 1})
+    enrollments = _sample(db, "enrolledCourses", {}, {"userId": 1, "courseId": 1})
+    forums = _sample(db, "forums", {}, {"_id": 1})
+    news = _sample(db, "news", {}, {"_id": 1})
+    if not (students and teachers and courses and enrollments and forums and news):
+        raise click.ClickException("La base de benchmark está vacía: ejecutar `flask bench seed` primero")
+    enrolled_lessons = {
+        c["_id"]: c.get("lessons", [])
+        for c in db.courses.find({"_id": {"$in": [e["courseId"] for e in enrollments]}}, {"lessons._id": 1})
+    }
+    enrollments = [e for e in enrollments if enrolled_lessons.get(e["courseId"])]
+
+    def uid(rng):
+        return str(rng.choice(students)["_id"])
+
+    def course_lesson(rng):
+        course = rng.choice(courses)
+        return course, rng.choice(course["lessons"])
+
+    def exercise_start(rng):
+        e = rng.choice(enrollments)
+        body = {"userId": str(e["userId"]), "courseId": str(e["courseId"]),
+                "lessonId": str(rng.choice(enrolled_lessons[e["courseId"]])["_id"])}
+
+        def cancel(response):
+            run_id = (response or {}).get("runId")
+            return ("POST", "/api/exercises/cancel", {"runId": run_id}) if run_id else None
+        return "POST", "/api/exercises/start", body, cancel
+
+    def items(rng):
+        course, lesson = course_lesson(rng)
+        return "GET", f"/api/exercises/items?courseId={course['_id']}&lessonId={lesson['_id']}", None, None
+
+    def check_exercise(rng):
+        course, lesson = course_lesson(rng)
+        exercise = rng.choice(lesson["exercises"])
+        return "GET", f"/api/courses/{course['_id']}/lessons/{lesson['_id']}/exercises/{exercise['_id']}", None, None
+
+    def forum_search(rng):
+        # el endpoint exige alcance: una lección o un curso completo
+        course, lesson = course_lesson(rng)
+        scope = f"lessonId={lesson['_id']}" if rng.random() < 0.5 else f"courseId={course['_id']}"
+        return "GET", f"/api/forum/search?q={urllib.parse.quote(rng.choice(_WORDS))}&{scope}", None, None
+
+    def follow(rng):
+        a, b = uid(rng), uid(rng)
+        return "POST", "/api/profile/follow", {"userId": a, "followId": b}, \
+            lambda _: ("POST", "/api/profile/unfollow", {"userId": a, "unfollowId": b})
+
+    return {
+        "GET /api/news/feed": lambda rng: ("GET", f"/api/news/feed?userId={uid(rng)}", None, None),
+        "GET /api/news/comments": lambda rng: ("GET", f"/api/news/comments?newsId={rng.choice(news)['_id']}", None, None),
+        "POST /api/news/like": lambda rng: ("POST", "/api/news/like", {
+            "newsId": str(rng.choice(news)["_id"]), "userId": uid(rng), "action": rng.choice(["like", "unlike"])
+        }, None),
+        "POST /api/news/comment": lambda rng: ("POST", "/api/news/comment", {
+            "newsId": str(rng.choice(news)["_id"]), "userId": uid(rng), "comment": "benchmark"
+        }, None),
+        "GET /api/profile/<user_id>": lambda rng: ("GET", f"/api/profile/{uid(rng)}", None, None),
+        "GET /api/profile/followers/<user_id>": lambda rng: ("GET", f"/api/profile/followers/{uid(rng)}", None, None),
+        "GET /api/profile/following/<user_id>": lambda rng: ("GET", f"/api/profile/following/{uid(rng)}", None, None),
+        "GET /api/profile/followers-list/<user_id>": lambda rng: ("GET", f"/api/profile/followers-list/{uid(rng)}", None, None),
+        "GET /api/profile/following-list/<user_id>": lambda rng: ("GET", f"/api/profile/following-list/{uid(rng)}", None, None),
+        "GET /api/profile/add-friends/<user_id>": lambda rng: ("GET", f"/api/profile/add-friends/{uid(rng)}", None, None),
+        "POST /api/profile/search/<user_id>": lambda rng: ("POST", f"/api/profile/search/{uid(rng)}", {
+            "searchQuery": rng.choice(_FIRST)[:rng.randint(2, 4)]
+        }, None),
+        "POST /api/profile/follow": follow,
+        "GET /api/profile/teacher/<user_id>": lambda rng: ("GET", f"/api/profile/teacher/{rng.choice(teachers)['_id']}", None, None),
+        "POST /api/auth/sync-user": lambda rng: ("POST", "/api/auth/sync-user", {
+            "uid": rng.choice(students)["firebaseUid"]
+        }, None),
+        "GET /api/auth/user-by-firebase/<uid>": lambda rng: (
+            "GET", f"/api/auth/user-by-firebase/{rng.choice(students)['firebaseUid']}", None, None),
+        "GET /api/my-courses/<user_id>": lambda rng: ("GET", f"/api/my-courses/{uid(rng)}", None, None),
+        "GET /api/available-courses/<user_id>": lambda rng: ("GET", f"/api/available-courses/{uid(rng)}", None, None),
+        "GET /api/list-lessons/<course_id>/<user_id>": lambda rng: (
+            "GET", f"/api/list-lessons/{rng.choice(courses)['_id']}/{uid(rng)}", None, None),
+        "GET /api/info-lesson/<lesson_id>/<user_id>": lambda rng: (
+            "GET", f"/api/info-lesson/{course_lesson(rng)[1]['_id']}/{uid(rng)}", None, None),
+        "GET /api/studentHome-info/<user_id>": lambda rng: ("GET", f"/api/studentHome-info/{uid(rng)}", None, None),
+        "GET /api/teacher-courses": lambda rng: (
+            "GET", f"/api/teacher-courses?user_id={rng.choice(teachers)['_id']}&language={rng.choice(['true', 'false'])}",
+            None, None),
+        "GET /api/course-students/<course_id>": lambda rng: (
+            "GET", f"/api/course-students/{rng.choice(courses)['_id']}", None, None),
+        "GET /api/courses/.../exercises/<exercise_id>": check_exercise,
+        "GET /api/exercises/items": items,
+        "POST /api/exercises/start": exercise_start,
+        "GET /api/forum/get-forums/<lesson_id>": lambda rng: (
+            "GET", f"/api/forum/get-forums/{course_lesson(rng)[1]['_id']}", None, None),
+        "GET /api/forum/get-comments/<forum_id>": lambda rng: (
+            "GET", f"/api/forum/get-comments/{rng.choice(forums)['_id']}", None, None),
+        "POST /api/forum/comment/<forum_id>/<user_id>": lambda rng: (
+            "POST", f"/api/forum/comment/{rng.choice(forums)['_id']}/{uid(rng)}", {"content": "benchmark"}, None),
+        "GET /api/forum/lessons-with-forum/<course_id>": lambda rng: (
+            "GET", f"/api/forum/lessons-with-forum/{rng.choice(courses)['_id']}", None, None),
+        "GET /api/forum/forum-teacher-courses/<teacher_id>": lambda rng: (
+            "GET", f"/api/forum/forum-teacher-courses/{rng.choice(teachers)['_id']}", None, None),
+        "GET /api/forum/search": forum_search,
+    }
+
+# ============================
+# Ejecución
+# ============================
+
+class _TestClientTransport:
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def __call__(self, method, url, body):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(url, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+class _HttpTransport:
+    def __init__(self, base_url):
+        self._base_url = base_url.rstrip("/")
+
+    def __call__(self, method, url, body):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self._base_url + url, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                status, payload = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        try:
+            return status, json.loads(payload or b"null")
+        except ValueError:
+            return status, None
+
+def percentile(sorted_values, p):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def run_scenario(transport, scenario, requests, concurrency, seed):
+    """Ejecuta `requests` llamadas con `concurrency` hilos. Devuelve el resumen del endpoint."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed * 100003 + index)
+        method, url, body, follow_up = scenario(rng)
+        started = time.perf_counter()
+        try:
+            status, payload = transport(method, url, body)
+        except Exception:
+            status, payload = 599, None
+        elapsed = time.perf_counter() - started
+        with lock:
+            # solo las respuestas 2xx cuentan como tiempos; el resto son errores
+            if 200 <= status < 300:
+                latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+        if follow_up:
+            # la limpieza (cancelar, dejar de seguir) no se mide; si falla no debe abortar la corrida
+            try:
+                extra = follow_up(payload)
+                if extra:
+                    transport(*extra)
+            except Exception:
+                pass
+
+    wall_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(requests)))
+    wall = time.perf_counter() - wall_started
+
+    latencies.sort()
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "requests": requests,
+        "errors": requests - len(latencies),
+        "statusCodes": {str(k): v for k, v in sorted(statuses.items())},
+        "p50Ms": ms(percentile(latencies, 50)),
+        "p95Ms": ms(percentile(latencies, 95)),
+        "p99Ms": ms(percentile(latencies, 99)),
+        "meanMs": ms(sum(latencies) / len(latencies)) if latencies else 0,
+        "maxMs": ms(latencies[-1]) if latencies else 0,
+        "throughputRps": round(len(latencies) / wall, 1) if wall else 0,
+    }
+
+# ============================
+# Comandos
+# ============================
+# flask bench seed [--users 2000 ...]
+# flask bench run [--requests 200 --concurrency 8 --output bench-results.json]
+bench_cli = AppGroup("bench", help="Dataset sintético y benchmark de endpoints")
+
+@bench_cli.command("seed")
+@click.option("--db", "db_name", default=BENCH_DB, show_default=True)
+@click.option("--users", default=2000, show_default=True)
+@click.option("--teachers", default=50, show_default=True)
+@click.option("--courses", default=100, show_default=True)
+@click.option("--lessons", default=10, show_default=True, help="lecciones por curso")
+@click.option("--exercises", default=8, show_default=True, help="ejercicios por lección")
+@click.option("--enrollments", default=5, show_default=True, help="cursos por estudiante")
+@click.option("--follows", default=30, show_default=True, help="seguidos por usuario")
+@click.option("--news", default=5, show_default=True, help="noticias por usuario")
+@click.option("--likes", default=5, show_default=True, help="likes promedio por noticia")
+@click.option("--comments", default=2, show_default=True, help="comentarios promedio por noticia/foro")
+@click.option("--forums", default=2, show_default=True, help="foros por lección")
+@click.option("--seed", default=42, show_default=True)
+def seed_command(db_name, seed, **sizes):
+    """Borra la base de benchmark y genera el dataset sintético."""
+    if db_name == current_app.db.name:
+        raise click.ClickException("La base de benchmark no puede ser la base de la app")
+    started = time.perf_counter()
+    counts = seed_dataset(current_app.db.client[db_name], seed=seed, **sizes)
+    for name, count in counts.items():
+        print(f"  {name}: {count}")
+    print(f"Dataset generado en {db_name} ({time.perf_counter() - started:.1f}s)")
+
+@bench_cli.command("run")
+@click.option("--db", "db_name", default=BENCH_DB, show_default=True)
+@click.option("--requests", default=200, show_default=True, help="requests por endpoint")
+@click.option("--concurrency", default=8, show_default=True)
+@click.option("--base-url", default=None, help="servidor real (por defecto, test client de Flask)")
+@click.option("--only", default=None, help="solo endpoints que contengan este texto")
+@click.option("--output", default="bench-results.json", show_default=True)
+@click.option("--seed", default=42, show_default=True)
+def run_command(db_name, requests, concurrency, base_url, only, output, seed):
+    """Mide latencia y throughput de cada endpoint sobre la base de benchmark."""
+    app = current_app._get_current_object()
+    bench_db = app.db.client[db_name]
+    scenarios = build_scenarios(bench_db)
+    if only:
+        scenarios = {name: fn for name, fn in scenarios.items() if only in name}
+
+    started_at = datetime.utcnow().isoformat() + "Z"
+    original_db = app.db
+    app.db = bench_db
+    try:
+        transport = _HttpTransport(base_url) if base_url else _TestClientTransport(app)
+        results = {}
+        for name, scenario in scenarios.items():
+            run_scenario(transport, scenario, min(concurrency * 2, requests), concurrency, seed + 1)  # calentamiento
+            results[name] = run_scenario(transport, scenario, requests, concurrency, seed)
+            r = results[name]
+            print(f"{name:<52} p50 {r['p50Ms']:>8}ms  p95 {r['p95Ms']:>8}ms  p99 {r['p99Ms']:>8}ms  "
+                  f"{r['throughputRps']:>7} req/s  errores {r['errors']}")
+    finally:
+        app.db = original_db
+
+    report = {
+        "startedAt": started_at,
+        "db": db_name,
+        "target": base_url or "flask-test-client",
+        "requestsPerEndpoint": requests,
+        "concurrency": concurrency,
+        "seed": seed,
+        "dataset": {name: bench_db[name].estimated_document_count() for name in sorted(bench_db.list_collection_names())},
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
@@ -0,0 +1,28 @@
+from pymongo.errors import BulkWriteError
+
+# ============================
+# insert_many tolerante a duplicados
+# ============================
+# Las migraciones y copias se pueden correr más de una vez: los documentos
+# que ya existen fallan con clave duplicada (código 11000) y se ignoran.
+# Cualquier otro error (validador, tamaño, write concern) se propaga, para
+# que quien llama no borre datos que no llegaron a copiarse.
+
+DUPLICATE_KEY = 11000
+
+def only_duplicates(error):
+    """True si todos los errores de un BulkWriteError son de clave duplicada."""
+    details = error.details or {}
+    return not details.get("writeConcernErrors") and all(
+        e.get("code") == DUPLICATE_KEY for e in details.get("writeErrors", [])
+    )
+
+def insert_ignoring_duplicates(collection, docs):
+    """insert_many sin orden; ignora solo los duplicados."""
+    if not docs:
+        return
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if not only_duplicates(e):
+            raise
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+import threading
+import time
+
+# ============================
+# Cache en memoria (LRU + TTL)
+# ============================
+# Cada proceso/worker tiene su propia copia; sirve para datos que toleran
+# unos segundos de atraso. Las caches se registran por nombre en CACHES
+# para poder inspeccionar su tasa de aciertos.
+
+CACHES = {}  # nombre -> TTLCache
+
+class TTLCache:
+    def __init__(self, name, maxsize=1024, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expira_en, valor)
+        self._lock = threading.Lock()
+        CACHES[name] = self
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
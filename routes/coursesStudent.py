@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify, current_app, request
 from bson import ObjectId
 from datetime import datetime
 from routes.exercises import _create_news_course_unsubscribe
+from routes.displayNames import resolve_user_names
+from routes.studentStatistics import safe_refresh_course_stats
 import re
 
 
@@ -40,19 +42,27 @@ def get_my_courses(user_id):
         return jsonify({'error': str(e)}), 500
 
 def get_info_enrolled_courses(db, user_id, language):
-    # Obtener todos los cursos inscritos del usuario
-    enrolled_courses = db.enrolledCourses.find({'userId': user_id})
+    # Obtener los IDs de los cursos inscritos del usuario
+    course_ids = [e['courseId'] for e in db.enrolledCourses.find({'userId': user_id}, {'courseId': 1})]
+    
+    # Buscar todos los cursos de una vez, filtrando por idioma
+    courses = list(db.courses.find(
+        {'_id': {'$in': course_ids}, 'language': language},
+        {'name': 1, 'difficulty': 1, 'lessons._id': 1, 'userId': 1, 'description': 1}
+    ))
+    by_id = {c['_id']: c for c in courses}
+    
+    # Nombres de los profesores en lote
+    teacher_names = resolve_user_names(db, [c['userId'] for c in courses])
     
     courses_list = []
     
-    for enrolled in enrolled_courses:
-        # Buscar el curso en la colección courses usando courseId
-        course = db.courses.find_one({'_id': enrolled['courseId']})
+    # Mantener el orden de inscripción
+    for course_id in course_ids:
+        course = by_id.get(course_id)
         
-        if course and course.get('language') == language:  # Filtrar por idioma
-            # Obtener el nombre del profesor usando userId del curso
-            teacher = db.users.find_one({'_id': course['userId']})
-            teacher_name = teacher.get('name', 'Profesor desconocido') if teacher else 'Profesor desconocido'
+        if course:
+            teacher_name = teacher_names.get(course['userId']) or 'Profesor desconocido'
             
             # Construir el objeto del curso
             course_data = {
@@ -124,6 +134,9 @@ def unenroll_course(user_id, course_id):
             {'_id': course_oid},
             {'$pull': {'students': user_oid}}
         )
+        
+        # Quitar el curso de las estadísticas del estudiante
+        safe_refresh_course_stats(db, user_oid, course_oid)
         # Crear noticia si NO estaba terminado
         if should_create_news:
             try:
@@ -171,23 +184,24 @@ def get_available_courses(user_id):
 def get_info_available_courses(db, user_id, language):
     # Obtener IDs de cursos inscritos por el usuario
     enrolled_course_ids = set()
-    enrolled_courses = db.enrolledCourses.find({'userId': user_id})
+    enrolled_courses = db.enrolledCourses.find({'userId': user_id}, {'courseId': 1})
     for enrolled in enrolled_courses:
         enrolled_course_ids.add(enrolled['courseId'])
     
     # Obtener cursos públicos del idioma que NO están inscritos
-    available_courses = db.courses.find({
+    available_courses = list(db.courses.find({
         'status': True,  # Solo públicos
         'language': language,  # Filtrar por idioma
         '_id': {'$nin': list(enrolled_course_ids)}  # Excluir inscritos
-    })
+    }, {'name': 1, 'difficulty': 1, 'lessons._id': 1, 'userId': 1, 'description': 1}))
+    
+    # Nombres de los profesores en lote
+    teacher_names = resolve_user_names(db, [c['userId'] for c in available_courses])
     
     courses_list = []
     
     for course in available_courses:
-        # Obtener el nombre del profesor usando userId del curso
-        teacher = db.users.find_one({'_id': course['userId']})
-        teacher_name = teacher.get('name', 'Profesor desconocido') if teacher else 'Profesor desconocido'
+        teacher_name = teacher_names.get(course['userId']) or 'Profesor desconocido'
         
         # Construir el objeto del curso
         course_data = {
@@ -257,6 +271,9 @@ def enroll_course(user_id, course_id):
             {'$addToSet': {'students': user_oid}}
         )
         
+        # Registrar el curso en las estadísticas del estudiante
+        safe_refresh_course_stats(db, user_oid, course_oid)
+        
         # Devolver respuesta exitosa
         return jsonify({
             'message': 'Inscripción exitosa',
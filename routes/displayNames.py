@@ -0,0 +1,91 @@
+from routes.cache import TTLCache
+
+# ============================
+# Nombres para mostrar de usuarios
+# ============================
+# Resolver compartido por noticias, foro y cursos: resuelve en lote con $in
+# y guarda en cache (LRU + TTL) el nombre para mostrar de cada usuario.
+# Cualquier cambio de name/firstName/lastName/email debe llamar a
+# invalidate_user_names(). Para verificar que un usuario existe (un borrado
+# sigue en cache hasta el TTL) se usa fetch_user_names().
+
+_NAMES_CACHE = TTLCache('user_display_names', maxsize=20000, ttl=600)
+_NAME_FIELDS = {"name": 1, "firstName": 1, "lastName": 1, "email": 1}
+_MISSING = object()
+
+def display_name(user_doc):
+    """
+    Prioridad: name, firstName + lastName, email. None si no hay ninguno.
+    """
+    if not user_doc:
+        return None
+    nm = (user_doc.get("name") or "").strip()
+    if nm:
+        return nm
+    fn = (user_doc.get("firstName") or "").strip()
+    ln = (user_doc.get("lastName") or "").strip()
+    full = f"{fn} {ln}".strip()
+    if full:
+        return full
+    em = (user_doc.get("email") or "").strip()
+    return em or None
+
+def initials_from_name(name):
+    if not isinstance(name, str) or not name.strip():
+        return "US"
+    parts = [p for p in name.strip().split() if p]
+    ini = "".join(p[0] for p in parts[:2]).upper()
+    return ini or "US"
+
+def resolve_user_names(db, user_ids):
+    """
+    Devuelve {ObjectId: nombre} para los usuarios existentes (nombre puede ser None
+    si el usuario no tiene ningún campo de nombre). Una sola consulta para los que
+    no están en cache.
+    """
+    names = {}
+    missing = []
+    for uid in set(user_ids):
+        if uid is None:
+            continue
+        cached = _NAMES_CACHE.get(uid, _MISSING)
+        if cached is _MISSING:
+            missing.append(uid)
+        else:
+            names[uid] = cached
+    if missing:
+        for u in db.users.find({"_id": {"$in": missing}}, _NAME_FIELDS):
+            name = display_name(u)
+            _NAMES_CACHE.set(u["_id"], name)
+            names[u["_id"]] = name
+    return names
+
+def fetch_user_names(db, user_ids):
+    """
+    Como resolve_user_names pero siempre consulta users (sin leer la cache),
+    así sirve para verificar que los usuarios existen; refresca la cache.
+    """
+    names = {}
+    for u in db.users.find({"_id": {"$in": [uid for uid in set(user_ids) if uid is not None]}}, _NAME_FIELDS):
+        name = display_name(u)
+        _NAMES_CACHE.set(u["_id"], name)
+        names[u["_id"]] = name
+    return names
+
+def user_public_info(db, user_id, names=None):
+    """
+    Objeto compacto para UI con id, name e initials.
+    `names` permite reutilizar un resultado de resolve_user_names.
+    """
+    if names is None:
+        names = resolve_user_names(db, [user_id])
+    display = names.get(user_id) or "Usuario"
+    return {
+        "id": str(user_id),
+        "name": display,
+        "initials": initials_from_name(display),
+    }
+
+def invalidate_user_names(*user_ids):
+    for uid in user_ids:
+        _NAMES_CACHE.invalidate(uid)
@@ -0,0 +1,56 @@
+import logging
+from pymongo.errors import BulkWriteError
+from routes.bulkInserts import insert_ignoring_duplicates
+
+# ============================
+# Migración de comentarios embebidos
+# ============================
+# forums y news guardaban sus comentarios en un array `comments`; ahora van
+# en su propia colección con commentCount/lastComment desnormalizados en el
+# padre. El array solo se quita cuando la colección tiene al menos tantos
+# comentarios del padre como el array; si no, el padre se omite y se avisa.
+# Las rutas migran un padre al encontrarlo todavía con el array (al leer sus
+# comentarios o al comentar), así nada deja de verse antes de la migración
+# completa; para detectarlo sin traer el array se proyecta LEGACY_PROBE.
+
+# proyección que deja `comments` (vacío) solo en los padres sin migrar
+LEGACY_PROBE = {"comments": {"$slice": 0}}
+
+_logger = logging.getLogger("routes.embeddedComments")
+
+def migrate_embedded_comments(db, parents, comments, parent_field, copy_fields=(), format_last=None, query=None):
+    """
+    Mueve `comments` de cada documento de la colección `parents` (los de
+    `query`, todos por defecto) a la colección `comments` (con parent_field
+    y copy_fields del padre). Devuelve (migrados, omitidos).
+    """
+    migrated = skipped = 0
+    projection = {"comments": 1, **{f: 1 for f in copy_fields}}
+    last_projection = {parent_field: 0, **{f: 0 for f in copy_fields}}
+
+    for parent in db[parents].find({**(query or {}), "comments": {"$exists": True}}, projection):
+        embedded = parent.get("comments") or []
+        extra = {parent_field: parent["_id"], **{f: parent.get(f) for f in copy_fields}}
+        try:
+            insert_ignoring_duplicates(db[comments], [{**c, **extra} for c in embedded])
+        except BulkWriteError as e:
+            _logger.warning(f"[migrate] {parents} {parent['_id']}: no se copiaron los comentarios, se omite: {e.details}")
+            skipped += 1
+            continue
+
+        # recalcular contador y último comentario desde la colección
+        count = db[comments].count_documents({parent_field: parent["_id"]})
+        if count < len(embedded):
+            _logger.warning(f"[migrate] {parents} {parent['_id']}: {count} de {len(embedded)} comentarios copiados, se omite")
+            skipped += 1
+            continue
+        last = db[comments].find_one({parent_field: parent["_id"]}, last_projection, sort=[("date", -1), ("_id", -1)])
+        if last and format_last:
+            last = format_last(last)
+
+        db[parents].update_one(
+            {"_id": parent["_id"]},
+            {"$set": {"commentCount": count, "lastComment": last}, "$unset": {"comments": ""}}
+        )
+        migrated += 1
+    return migrated, skipped
@@ -0,0 +1,178 @@
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from routes.follows import following_ids
+import json
+import queue
+import threading
+import time
+
+events_bp = Blueprint("events", __name__)
+
+# ============================
+# Como realizar peticiones CURL / pruebas
+# ============================
+# curl -N "http://localhost:5000/api/events/stream?userId=<USER_ID>"
+# opcionalmente también se puede escuchar un hilo del foro o una lección:
+# curl -N "http://localhost:5000/api/events/stream?userId=<USER_ID>&forumId=<FORUM_ID>&lessonId=<LESSON_ID>"
+
+# ============================
+# Tópicos
+# ============================
+# user:<userId>    -> eventos dirigidos a un usuario (likes, comentarios, logros, nivel)
+# news:<userId>    -> noticias publicadas por un usuario (lo escuchan sus seguidores)
+# forum:<forumId>  -> comentarios nuevos en un hilo del foro
+# lesson:<lessonId>-> hilos nuevos en el foro de una lección
+
+HEARTBEAT_SECONDS = 15   # mantiene viva la conexión a través de proxies
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class InProcessBroker:
+    """
+    Pub/sub en memoria: cada suscriptor tiene su propia cola.
+    Solo entrega a conexiones del mismo proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = {}  # topic -> set(queue)
+
+    def subscribe(self, topics):
+        q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            for topic in topics:
+                self._topics.setdefault(topic, set()).add(q)
+        return q
+
+    def unsubscribe(self, q, topics):
+        with self._lock:
+            for topic in topics:
+                subs = self._topics.get(topic)
+                if subs:
+                    subs.discard(q)
+                    if not subs:
+                        del self._topics[topic]
+
+    def publish(self, topic, event_type, data):
+        self._dispatch(topic, event_type, data)
+
+    def _dispatch(self, topic, event_type, data):
+        with self._lock:
+            subs = list(self._topics.get(topic, ()))
+        message = {"type": event_type, "topic": topic, "data": data}
+        for q in subs:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # cliente lento: se descarta el evento, el cliente puede recargar
+                pass
+
+class MongoChangeStreamBroker(InProcessBroker):
+    """
+    Publica insertando en la colección `events` y reparte a los suscriptores
+    locales leyendo un change stream, así todos los workers reciben todo.
+    Requiere que MongoDB corra como replica set.
+    """
+
+    def __init__(self, db, logger):
+        super().__init__()
+        self._db = db
+        self._logger = logger
+        self._thread = threading.Thread(target=self._watch, name="events-change-stream", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic, event_type, data):
+        self._db.events.insert_one({
+            "topic": topic,
+            "type": event_type,
+            "data": data,
+            "date": datetime.utcnow()
+        })
+
+    def _watch(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                with self._db.events.watch(pipeline) as stream:
+                    for change in stream:
+                        doc = change["fullDocument"]
+                        self._dispatch(doc["topic"], doc["type"], doc.get("data"))
+            except Exception:
+                self._logger.exception("[events] change stream interrumpido, reintentando")
+                time.sleep(5)
+
+def init_app(app):
+    """
+    Crea el broker según app.config['EVENTS_BACKEND']:
+    'memory' (por defecto, un solo worker) o 'mongo' (change streams).
+    """
+    backend = app.config.get("EVENTS_BACKEND", "memory")
+    if backend == "mongo":
+        broker = MongoChangeStreamBroker(app.db, app.logger)
+    else:
+        broker = InProcessBroker()
+    app.extensions["events"] = broker
+
+def publish(topic, event_type, data):
+    """
+    Publica un evento. Nunca interrumpe la operación que lo origina.
+    `data` debe ser serializable a JSON (ObjectId/fechas ya convertidos).
+    """
+    try:
+        broker = current_app.extensions.get("events")
+        if broker:
+            broker.publish(topic, event_type, data)
+    except Exception:
+        current_app.logger.exception(f"[events] error publicando {event_type} en {topic}")
+
+def _format_sse(message):
+    return f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+
+# ============================
+# Endpoints
+# ============================
+@events_bp.route("/stream", methods=["GET"])
+def stream_events():
+    """
+    GET /api/events/stream?userId=<id>[&forumId=<id>][&lessonId=<id>]
+    Server-sent events: comentarios, noticias de seguidos, likes, logros y nivel.
+    """
+    db = current_app.db
+    try:
+        user_oid = ObjectId(request.args.get("userId"))
+        forum_id = request.args.get("forumId")
+        lesson_id = request.args.get("lessonId")
+        extra = [
+            f"forum:{ObjectId(forum_id)}" if forum_id else None,
+            f"lesson:{ObjectId(lesson_id)}" if lesson_id else None,
+        ]
+    except (InvalidId, TypeError):
+        return jsonify({"error": "invalid id"}), 400
+
+    following = following_ids(db, user_oid)
+    topics = [f"user:{user_oid}", f"news:{user_oid}"]
+    topics += [f"news:{oid}" for oid in following]
+    topics += [t for t in extra if t]
+
+    broker = current_app.extensions["events"]
+    q = broker.subscribe(topics)
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    message = q.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield _format_sse(message)
+        finally:
+            broker.unsubscribe(q, topics)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,8 +1,12 @@
 from flask import Blueprint, jsonify, current_app, request
 from bson import ObjectId
 from bson.errors import InvalidId
-from datetime import datetime
+from datetime import datetime, timedelta
 from uuid import uuid4
+from pymongo import ReturnDocument
+from routes.events import publish
+from routes.timeline import enqueue_fanout
+from routes.studentStatistics import safe_refresh_course_stats
 
 exercises_bp = Blueprint("exercises", __name__)
 
@@ -341,7 +345,8 @@ def _create_news_after_achievement(db, user_oid: ObjectId, category: str, value:
       description: string,
       likes: 0,
       date: Date,
-      comments: []
+      commentCount: 0,
+      lastComment: null
     }
     Evita duplicar exacto (mismo userId + title + description)
     """
@@ -358,18 +363,37 @@ def _create_news_after_achievement(db, user_oid: ObjectId, category: str, value:
     if exists:
         return
 
-    db.news.insert_one({
+    news_doc = {
         "userId": user_oid,
+        "kind": "achievement",
         "title": title,
         "description": desc,
         "likes": 0,
         "date": datetime.utcnow(),
-        "comments": []
+        "commentCount": 0,
+        "lastComment": None
+    }
+    db.news.insert_one(news_doc)
+    _after_news_created(db, news_doc)
+
+def _after_news_created(db, news_doc):
+    """
+    Reparte la noticia a los timelines de los seguidores (en segundo plano)
+    y avisa por el tópico news:<userId> a los que están conectados.
+    """
+    enqueue_fanout(db, news_doc)
+    publish(f"news:{news_doc['userId']}", "news.created", {
+        "_id": str(news_doc["_id"]),
+        "userId": str(news_doc["userId"]),
+        "title": news_doc.get("title"),
+        "description": news_doc.get("description"),
+        "date": news_doc["date"].isoformat() + "Z"
     })
 
-def _create_news_generic(db, user_oid, title: str, description: str):
+def _create_news_generic(db, user_oid, title: str, description: str, kind: str = None):
     """
     Crea una noticia genérica con la estructura estándar.
+    `kind` identifica las noticias automáticas (ver routes/retention.py).
     Evita duplicados exactos por usuario + título + descripción el mismo día.
     """
     exists = db.news.find_one({
@@ -381,14 +405,19 @@ def _create_news_generic(db, user_oid, title: str, description: str):
     if exists:
         return
 
-    db.news.insert_one({
+    news_doc = {
         "userId": user_oid,
         "title": title,
         "description": description,
         "likes": 0,
         "date": datetime.utcnow(),
-        "comments": []
-    })
+        "commentCount": 0,
+        "lastComment": None
+    }
+    if kind:
+        news_doc["kind"] = kind
+    db.news.insert_one(news_doc)
+    _after_news_created(db, news_doc)
 
 def _create_news_course_unsubscribe(db, user_oid, course_doc):
     """
@@ -401,11 +430,39 @@ def _create_news_course_unsubscribe(db, user_oid, course_doc):
     title = f"{user_name} dejó el curso {course_name}"
     desc = "¡No te rindas!"
 
-    _create_news_generic(db, user_oid, title, desc)
+    _create_news_generic(db, user_oid, title, desc, kind="unsubscribe")
+
+# Descripción según desempeño: (proporción mínima de aciertos, texto)
+_ACTIVITY_DESCS = [
+    (0.9, "¡Excelente trabajo!"),
+    (0.6, "Buen desempeño, sigue mejorando."),
+]
+_ACTIVITY_DESC_DEFAULT = "No te preocupes, la práctica hace al maestro."
+
+def _activity_desc(correct: int, total: int) -> str:
+    # Descripción dinámica según desempeño
+    ratio = (correct / total) if total > 0 else 0
+    for minimum, text in _ACTIVITY_DESCS:
+        if ratio >= minimum:
+            return text
+    return _ACTIVITY_DESC_DEFAULT
+
+def _activity_desc_expr(correct, total):
+    """_activity_desc como expresión de agregación (para updates con pipeline)."""
+    ratio = {"$cond": [{"$gt": [total, 0]}, {"$divide": [correct, total]}, 0]}
+    return {"$switch": {
+        "branches": [{"case": {"$gte": [ratio, minimum]}, "then": text} for minimum, text in _ACTIVITY_DESCS],
+        "default": _ACTIVITY_DESC_DEFAULT
+    }}
 
 def _create_news_activity_result(db, user_oid, course_doc, lesson_doc, correct: int, total: int):
     """
     Crea noticia cuando el usuario termina una actividad/lección desde el frontend.
+    Los resultados del mismo usuario y curso dentro de la ventana
+    NEWS_ACTIVITY_WINDOW_MINUTES se agrupan en una sola noticia (kind "activity")
+    que se actualiza en el lugar: "completó N lecciones en el curso X".
+    La ventana es móvil y no admite índice único: si llegan a la vez dos
+    primeros resultados del mismo curso pueden quedar dos noticias, y se acepta.
     """
     user_doc = db.users.find_one({"_id": user_oid}, {"name": 1, "firstName": 1, "lastName": 1})
     user_name = _user_display_name_for_news(user_doc)
@@ -413,18 +470,61 @@ def _create_news_activity_result(db, user_oid, course_doc, lesson_doc, correct:
     course_name = course_doc.get("name", "un curso")
     lesson_name = lesson_doc.get("name", "una lección")
 
-    title = f"{user_name} obtuvo {correct}/{total} en la lección {lesson_name} del curso {course_name}"
+    now = datetime.utcnow()
+    window = timedelta(minutes=current_app.config.get("NEWS_ACTIVITY_WINDOW_MINUTES", 60))
 
-    # Descripción dinámica según desempeño
-    ratio = (correct / total) if total > 0 else 0
-    if ratio >= 0.9:
-        desc = "¡Excelente trabajo!"
-    elif ratio >= 0.6:
-        desc = "Buen desempeño, sigue mejorando."
-    else:
-        desc = "No te preocupes, la práctica hace al maestro."
+    # Una sola escritura (update con pipeline): suma a la noticia abierta del
+    # curso o crea una nueva, y en el mismo paso rearma título y descripción.
+    # La fecha de la noticia no cambia para no moverla dentro de los timelines.
+    first_title = f"{user_name} obtuvo {correct}/{total} en la lección {lesson_name} del curso {course_name}"
+    news_doc = db.news.find_one_and_update(
+        {
+            "userId": user_oid,
+            "courseId": course_doc["_id"],
+            "kind": "activity",
+            "date": {"$gte": now - window}
+        },
+        [
+            {"$set": {
+                "activityCount": {"$add": [{"$ifNull": ["$activityCount", 0]}, 1]},
+                "correctTotal": {"$add": [{"$ifNull": ["$correctTotal", 0]}, correct]},
+                "questionTotal": {"$add": [{"$ifNull": ["$questionTotal", 0]}, total]},
+                "lastActivityAt": now,
+                "likes": {"$ifNull": ["$likes", 0]},
+                "date": {"$ifNull": ["$date", now]},
+                "commentCount": {"$ifNull": ["$commentCount", 0]},
+                "lastComment": {"$ifNull": ["$lastComment", None]}
+            }},
+            {"$set": {
+                "title": {"$cond": [
+                    {"$eq": ["$activityCount", 1]},
+                    {"$literal": first_title},
+                    {"$concat": [
+                        {"$literal": f"{user_name} completó "},
+                        {"$toString": "$activityCount"},
+                        {"$literal": f" lecciones en el curso {course_name}"}
+                    ]}
+                ]},
+                "description": _activity_desc_expr("$correctTotal", "$questionTotal")
+            }}
+        ],
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
 
-    _create_news_generic(db, user_oid, title, desc)
+    count = news_doc.get("activityCount", 1)
+    if count == 1:
+        _after_news_created(db, news_doc)
+        return
+
+    publish(f"news:{user_oid}", "news.updated", {
+        "_id": str(news_doc["_id"]),
+        "userId": str(user_oid),
+        "title": news_doc["title"],
+        "description": news_doc["description"],
+        "activityCount": count,
+        "date": news_doc["date"].isoformat() + "Z"
+    })
 
 # ============================
 # Achievements helpers 
@@ -491,6 +591,13 @@ def _grant_milestone(db, user_oid, type_bool, category, value):
     granted = _grant_achievement(db, user_oid, ach_id)
     if granted:
         _create_news_after_achievement(db, user_oid, category, value, type_bool)
+        publish(f"user:{user_oid}", "achievement", {
+            "achievementId": str(ach_id),
+            "title": name,
+            "category": category,
+            "value": value,
+            "type": "LIBRAS" if type_bool else "LESCO"
+        })
     return granted
 
 def _check_and_award_achievements_count(db, user_oid, type_bool):
@@ -639,6 +746,9 @@ def start_exercise():
     if not ok and not unlimited:
         return jsonify({"error": reason or "no attempts remaining"}), 403
 
+    # la lección ya cuenta como iniciada y el intento como usado
+    safe_refresh_course_stats(current_app.db, user_oid, course["_id"])
+
     # preparar preguntas SAFE en orden
     raw = lesson.get("exercises") or []
     safe = [_safe_question(q) for q in raw]
@@ -937,6 +1047,9 @@ def finish_run():
     except Exception:
         current_app.logger.exception("Error otorgando habilidades/level-up en /finish (pre-bump)")
 
+    if leveled_up:
+        publish(f"user:{sess['userId']}", "level.up", {"newLevel": new_level, "lang": lang_code})
+
     # AHORA SÍ: actualiza el mejor puntaje
     _bump_best_correct_count(current_app.db, sess["userId"], course, lesson, correct)
 
@@ -975,6 +1088,8 @@ def finish_run():
     except Exception:
         current_app.logger.exception("Error procesando logros en /finish")
 
+    safe_refresh_course_stats(current_app.db, sess["userId"], course["_id"])
+
     # limpiar sesión
     sess["state"] = "finished"
     ukey = str(sess["userId"])
@@ -1026,6 +1141,8 @@ def cancel_run():
     # 2) CompletionDate SIEMPRE
     _set_lesson_completion_date(current_app.db, sess["userId"], course, lesson, now)
 
+    safe_refresh_course_stats(current_app.db, sess["userId"], course["_id"])
+
     # limpiar sesión
     sess["state"] = "canceled"
     ukey = str(sess["userId"])
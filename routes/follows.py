@@ -0,0 +1,169 @@
+import logging
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from routes.bulkInserts import insert_ignoring_duplicates, only_duplicates
+from routes.pagination import encode_cursor, keyset_filter
+
+# ============================
+# Grafo de seguidores (colección follows)
+# ============================
+# Cada relación es un documento { follower, followee, createdAt } con índices
+# únicos (follower, followee) y (followee, follower). Los totales se guardan
+# como contadores en users: followersCount y followingCount.
+# Los arrays viejos de users (followers/following) se pasan a follows una
+# vez por base al arrancar (routes/migrations.py) o con `flask user migrate-follows`.
+
+_logger = logging.getLogger("routes.follows")
+
+def following_ids(db, user_oid):
+    """IDs de los usuarios que user_oid sigue."""
+    return [e["followee"] for e in db.follows.find({"follower": user_oid}, {"followee": 1, "_id": 0})]
+
+def follower_ids(db, user_oid):
+    """IDs de los seguidores de user_oid."""
+    return [e["follower"] for e in db.follows.find({"followee": user_oid}, {"follower": 1, "_id": 0})]
+
+def follow_page(db, user_oid, followers, limit, cursor=None):
+    """
+    Página de seguidores (followers=True) o seguidos de user_oid, más recientes
+    primero, ordenada por (createdAt, _id) de la relación. Devuelve
+    (ids, nextCursor). Lanza ValueError si el cursor no es válido.
+    """
+    own, other = ("followee", "follower") if followers else ("follower", "followee")
+    query = {own: user_oid}
+    if cursor:
+        query.update(keyset_filter(cursor, "createdAt"))
+    edges = list(
+        db.follows.find(query, {other: 1, "createdAt": 1})
+        .sort([("createdAt", -1), ("_id", -1)])
+        .limit(limit)
+    )
+    next_cursor = None
+    if len(edges) == limit:
+        next_cursor = encode_cursor(edges[-1]["createdAt"], edges[-1]["_id"])
+    return [e[other] for e in edges], next_cursor
+
+def is_following(db, follower, followee):
+    return db.follows.count_documents({"follower": follower, "followee": followee}, limit=1) > 0
+
+def follow_counts(user_doc):
+    """(seguidores, seguidos) desde los contadores del documento de usuario."""
+    user_doc = user_doc or {}
+    return int(user_doc.get("followersCount", 0)), int(user_doc.get("followingCount", 0))
+
+def _counter_ops(follower, followees, delta):
+    """Un $inc para el que sigue y uno por cada seguido, en un solo bulk_write."""
+    ops = [UpdateOne({"_id": follower}, {"$inc": {"followingCount": delta * len(followees)}})]
+    ops += [UpdateOne({"_id": f}, {"$inc": {"followersCount": delta}}) for f in followees]
+    return ops
+
+def add_follow(db, follower, followee):
+    """Crea la relación. Devuelve False si ya existía."""
+    try:
+        db.follows.insert_one({"follower": follower, "followee": followee, "createdAt": datetime.utcnow()})
+    except DuplicateKeyError:
+        return False
+    db.users.bulk_write(_counter_ops(follower, [followee], 1), ordered=True)
+    return True
+
+def add_follows(db, follower, followees):
+    """
+    Sigue a varios usuarios a la vez. Devuelve la lista de los que se siguieron
+    ahora (los que ya se seguían se ignoran por el índice único).
+    """
+    followees = [f for f in dict.fromkeys(followees) if f != follower]
+    if not followees:
+        return []
+    now = datetime.utcnow()
+    error = None
+    failed = set()
+    try:
+        db.follows.bulk_write(
+            [InsertOne({"follower": follower, "followee": f, "createdAt": now}) for f in followees],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        # duplicados: relaciones que ya existían; cualquier otro error se propaga
+        failed = {err["index"] for err in e.details.get("writeErrors", [])}
+        if not only_duplicates(e):
+            error = e
+    added = [f for i, f in enumerate(followees) if i not in failed]
+    if added:
+        # los contadores de lo que sí se insertó se actualizan aunque haya error
+        db.users.bulk_write(_counter_ops(follower, added, 1), ordered=True)
+    if error:
+        raise error
+    return added
+
+def remove_follow(db, follower, followee):
+    """Elimina la relación. Devuelve False si no existía."""
+    res = db.follows.delete_one({"follower": follower, "followee": followee})
+    if not res.deleted_count:
+        return False
+    db.users.bulk_write(_counter_ops(follower, [followee], -1), ordered=True)
+    return True
+
+def recount_follows(db):
+    """Recalcula followersCount/followingCount de todos los usuarios desde follows."""
+    db.users.update_many({}, {"$set": {"followersCount": 0, "followingCount": 0}})
+    for field, key in (("followersCount", "$followee"), ("followingCount", "$follower")):
+        ops = [
+            UpdateOne({"_id": row["_id"]}, {"$set": {field: row["count"]}})
+            for row in db.follows.aggregate([{"$group": {"_id": key, "count": {"$sum": 1}}}])
+        ]
+        for i in range(0, len(ops), 1000):
+            db.users.bulk_write(ops[i:i + 1000], ordered=False)
+
+def _as_oid(value):
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+def migrate_follow_arrays(db):
+    """
+    Pasa los arrays followers/following (y los campos viejos follows,
+    information.following) de users a la colección follows, recalcula los
+    contadores y elimina los arrays de cada usuario cuyas relaciones quedaron
+    en follows (los demás se omiten y se avisa). Se puede correr más de una vez.
+    """
+    now = datetime.utcnow()
+    legacy = {"followers": 1, "following": 1, "follows": 1, "information.following": 1}
+    query = {"$or": [{f: {"$exists": True}} for f in legacy]}
+    migrated = 0
+
+    for u in db.users.find(query, legacy):
+        edges = set()
+        info = u.get("information") or {}
+        for arr in (u.get("following"), u.get("follows"), info.get("following")):
+            for x in arr or []:
+                edges.add((u["_id"], _as_oid(x)))
+        for x in u.get("followers") or []:
+            edges.add((_as_oid(x), u["_id"]))
+        edges = {(a, b) for a, b in edges if a and b and a != b}
+
+        try:
+            # las relaciones ya migradas fallan por el índice único y se ignoran
+            insert_ignoring_duplicates(
+                db.follows, [{"follower": a, "followee": b, "createdAt": now} for a, b in edges]
+            )
+        except BulkWriteError as e:
+            _logger.warning(f"[migrate-follows] usuario {u['_id']}: no se copiaron sus relaciones, se omite: {e.details}")
+            continue
+
+        # los arrays se quitan solo si todas las relaciones están en follows
+        if edges:
+            stored = db.follows.count_documents({"$or": [{"follower": a, "followee": b} for a, b in edges]})
+            if stored < len(edges):
+                _logger.warning(f"[migrate-follows] usuario {u['_id']}: {stored} de {len(edges)} relaciones en follows, se omite")
+                continue
+        db.users.update_one({"_id": u["_id"]}, {"$unset": {f: "" for f in legacy}})
+        migrated += 1
+
+    recount_follows(db)
+    return migrated
@@ -1,10 +1,29 @@
 from flask import Blueprint, jsonify, current_app, request
 from bson import ObjectId
 from datetime import datetime
+from routes.pagination import encode_cursor, keyset_filter, page_limit
+from routes.events import publish
+from routes.cache import TTLCache
+from routes.displayNames import resolve_user_names
+from routes.embeddedComments import LEGACY_PROBE, migrate_embedded_comments
 import re
+import unicodedata
 
 forum_blueprint = Blueprint('forum', __name__)
 
+# Resumen de actividad del foro por curso (pantalla de lecciones con foro)
+_LESSONS_FORUM_CACHE = TTLCache('lessons_with_forum', maxsize=512, ttl=30)
+
+def _migrate_forum_comments(db, query=None):
+    """Pasa los comentarios embebidos de los posts de `query` a forumComments."""
+    def with_user_name(last):
+        user_name = resolve_user_names(db, [last['userId']]).get(last['userId'])
+        return {**last, 'userName': user_name or 'Usuario desconocido'}
+
+    return migrate_embedded_comments(
+        db, 'forums', 'forumComments', 'forumId', copy_fields=('lessonId',), format_last=with_user_name, query=query
+    )
+
 # Iniciales para el avatar
 def get_initials(name):
     # Se divide el nombre por espacios
@@ -64,12 +83,13 @@ def create_forum_post(lesson_id, user_id):
             return jsonify({'error': 'El contenido es requerido'}), 400
         
         # Verificar que el usuario existe
-        user = db.users.find_one({'_id': user_oid})
-        if not user:
+        names = resolve_user_names(db, [user_oid])
+        if user_oid not in names:
             return jsonify({'error': 'Usuario no encontrado'}), 404
+        user_name = names[user_oid] or 'Usuario desconocido'
     
         # Verificar que la lección existe (buscar en cursos)
-        course = db.courses.find_one({'lessons._id': lesson_oid})
+        course = db.courses.find_one({'lessons._id': lesson_oid}, {'_id': 1})
         if not course:
             return jsonify({'error': 'Lección no encontrada'}), 404
         
@@ -80,10 +100,23 @@ def create_forum_post(lesson_id, user_id):
             'content': content,
             'videoURL': video_url,  
             'creationDate': datetime.utcnow(),
-            'comments': []  
+            # Datos desnormalizados para el listado del foro
+            # (los comentarios viven en la colección forumComments)
+            'commentCount': 0,
+            'lastComment': None
         }
         
         forum_id = db.forums.insert_one(forum_post).inserted_id
+        _LESSONS_FORUM_CACHE.invalidate(course['_id'])
+        
+        # Avisar a quienes siguen el foro de la lección
+        publish(f"lesson:{lesson_oid}", "forum.post", {
+            'forumId': str(forum_id),
+            'lessonId': str(lesson_oid),
+            'userName': user_name,
+            'content': content,
+            'videoURL': video_url
+        })
         
         return jsonify({
             'message': 'Post creado exitosamente',
@@ -111,14 +144,10 @@ def add_comment(forum_id, user_id):
             return jsonify({'error': 'El contenido del comentario es requerido'}), 400
         
         # Verificar que el usuario existe
-        user = db.users.find_one({'_id': user_oid})
-        if not user:
+        names = resolve_user_names(db, [user_oid])
+        if user_oid not in names:
             return jsonify({'error': 'Usuario no encontrado'}), 404
-        
-        # Verificar que el post del foro existe
-        forum_post = db.forums.find_one({'_id': forum_oid})
-        if not forum_post:
-            return jsonify({'error': 'Post del foro no encontrado'}), 404
+        user_name = names[user_oid] or 'Usuario desconocido'
         
         # Crear el comentario
         comment = {
@@ -129,12 +158,41 @@ def add_comment(forum_id, user_id):
             'date': datetime.utcnow()
         }
         
-        # Agregar el comentario al array del post
-        db.forums.update_one(
+        # Actualizar el contador y el último comentario del post
+        # (incluye el nombre del autor para no resolverlo al listar)
+        forum_post = db.forums.find_one_and_update(
             {'_id': forum_oid},
-            {'$push': {'comments': comment}}
+            {
+                '$inc': {'commentCount': 1},
+                '$set': {'lastComment': {**comment, 'userName': user_name}}
+            },
+            projection={'lessonId': 1, 'userId': 1, **LEGACY_PROBE}
         )
         
+        # Verificar que el post del foro existe
+        if not forum_post:
+            return jsonify({'error': 'Post del foro no encontrado'}), 404
+        
+        # Guardar el comentario en su propia colección
+        # (lessonId permite acotar la búsqueda por lección o curso)
+        db.forumComments.insert_one({**comment, 'forumId': forum_oid, 'lessonId': forum_post['lessonId']})
+        
+        # Post con comentarios embebidos: migrarlo recalcula el contador con todos
+        if 'comments' in forum_post:
+            _migrate_forum_comments(db, {'_id': forum_oid})
+        
+        # Notificar a quienes tienen abierto el hilo y al autor del post
+        event = {
+            'forumId': str(forum_oid),
+            'commentId': str(comment['_id']),
+            'userName': user_name,
+            'content': content,
+            'videoURL': video_url
+        }
+        publish(f"forum:{forum_oid}", "forum.comment", event)
+        if forum_post['userId'] != user_oid:
+            publish(f"user:{forum_post['userId']}", "forum.comment", event)
+        
         return jsonify({
             'message': 'Comentario agregado exitosamente',
             'commentId': str(comment['_id'])
@@ -146,9 +204,14 @@ def add_comment(forum_id, user_id):
 
 @forum_blueprint.route('/get-forums/<lesson_id>', methods=['GET'])
 def get_forum(lesson_id):
+    """
+    GET /api/forum/get-forums/<lesson_id>?limit=20&cursor=<nextCursor>
+    Lista los hilos de la lección (más recientes primero), paginados por cursor.
+    """
     try:
         db = current_app.db
         lesson_oid = ObjectId(lesson_id)
+        limit = page_limit(request.args.get('limit'))
         
         # Buscar la lección en courses para obtener nombre y profesor
         course = db.courses.find_one({'lessons._id': lesson_oid}, {'lessons.$': 1, 'userId': 1})
@@ -158,30 +221,52 @@ def get_forum(lesson_id):
         lesson = course['lessons'][0]
         lesson_name = lesson['name']
         
-        # Obtener nombre del profesor
-        teacher = db.users.find_one({'_id': course['userId']}, {'name': 1})
-        teacher_name = teacher['name'] if teacher else 'Profesor desconocido'
+        # Filtro por lección + continuación desde el cursor (índice lessonId, creationDate, _id)
+        match = {'lessonId': lesson_oid}
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                match.update(keyset_filter(cursor, 'creationDate'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        # Una sola consulta: no se trae el array de comentarios, solo los datos
+        # desnormalizados (con respaldo para posts creados antes de tenerlos)
+        forums = list(db.forums.aggregate([
+            {'$match': match},
+            {'$sort': {'creationDate': -1, '_id': -1}},
+            {'$limit': limit},
+            {'$project': {
+                'userId': 1,
+                'content': 1,
+                'videoURL': 1,
+                'creationDate': 1,
+                'commentCount': {'$ifNull': ['$commentCount', {'$size': {'$ifNull': ['$comments', []]}}]},
+                'lastComment': {'$ifNull': ['$lastComment', {'$arrayElemAt': ['$comments', -1]}]}
+            }}
+        ]))
+        
+        # Resolver en lote los nombres (profesor, autores y comentarios sin userName)
+        user_ids = {course['userId']}
+        for forum in forums:
+            user_ids.add(forum['userId'])
+            latest = forum.get('lastComment')
+            if latest and not latest.get('userName'):
+                user_ids.add(latest['userId'])
+        names = resolve_user_names(db, user_ids)
         
-        # Buscar todos los foros de la lección
-        forums = list(db.forums.find({'lessonId': lesson_oid}))
+        teacher_name = names.get(course['userId']) or 'Profesor desconocido'
         
         forum_data = []
         for forum in forums:
-            # Obtener nombre del usuario que creó el post
-            user = db.users.find_one({'_id': forum['userId']}, {'name': 1})
-            user_name = user['name'] if user else 'Usuario desconocido'
+            user_name = names.get(forum['userId']) or 'Usuario desconocido'
             
-            # Contar comentarios
-            comment_count = len(forum.get('comments', []))
-            
-            # Obtener el comentario más reciente (si hay)
+            # Comentario más reciente (si hay)
             latest_comment = None
-            if comment_count > 0:
-                comments = sorted(forum['comments'], key=lambda x: x['date'], reverse=True)
-                latest = comments[0]
-                latest_user = db.users.find_one({'_id': latest['userId']}, {'name': 1})
+            latest = forum.get('lastComment')
+            if latest:
                 latest_comment = {
-                    'userName': latest_user['name'],
+                    'userName': latest.get('userName') or names.get(latest['userId']) or 'Usuario desconocido',
                     'content': latest['content'],
                     'videoURL': latest.get('videoURL'),
                     'date': time_ago(latest['date'])  
@@ -194,14 +279,21 @@ def get_forum(lesson_id):
                 'content': forum['content'],
                 'videoURL': forum.get('videoURL'),
                 'date': time_ago(forum['creationDate']), 
-                'commentCount': comment_count,
+                'commentCount': forum['commentCount'],
                 'latestComment': latest_comment
             })
         
+        # Cursor para la siguiente página (None si no hay más)
+        next_cursor = None
+        if len(forums) == limit:
+            last = forums[-1]
+            next_cursor = encode_cursor(last['creationDate'], last['_id'])
+        
         return jsonify({
             'lessonName': lesson_name,
             'teacherName': teacher_name,
-            'forums': forum_data
+            'forums': forum_data,
+            'nextCursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -210,19 +302,46 @@ def get_forum(lesson_id):
 
 @forum_blueprint.route('/get-comments/<forum_id>', methods=['GET'])
 def get_comments(forum_id):
+    """
+    GET /api/forum/get-comments/<forum_id>?limit=20&cursor=<nextCursor>
+    Comentarios del post en orden cronológico, paginados por cursor.
+    """
     try:
         db = current_app.db
         forum_oid = ObjectId(forum_id)
+        limit = page_limit(request.args.get('limit'))
         
         # Buscar el post del foro
-        forum = db.forums.find_one({'_id': forum_oid})
+        forum = db.forums.find_one({'_id': forum_oid}, {'_id': 1, **LEGACY_PROBE})
         if not forum:
             return jsonify({'error': 'Post del foro no encontrado'}), 404
         
+        # Post creado antes de forumComments: se migra antes de leer
+        if 'comments' in forum:
+            _migrate_forum_comments(db, {'_id': forum_oid})
+        
+        # Índice (forumId, date, _id): la página es un rango del índice
+        query = {'forumId': forum_oid}
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                query.update(keyset_filter(cursor, 'date', descending=False))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        comments = list(
+            db.forumComments.find(query)
+            .sort([('date', 1), ('_id', 1)])
+            .limit(limit)
+        )
+        
+        # Resolver los autores en una sola consulta
+        user_ids = list({c['userId'] for c in comments})
+        names = resolve_user_names(db, user_ids)
+        
         comments_data = []
-        for comment in forum.get('comments', []):
-            user = db.users.find_one({'_id': comment['userId']}, {'name': 1})
-            user_name = user['name'] if user else 'Usuario desconocido'
+        for comment in comments:
+            user_name = names.get(comment['userId']) or 'Usuario desconocido'
             
             comments_data.append({
                 'id': str(comment['_id']),
@@ -233,8 +352,14 @@ def get_comments(forum_id):
                 'videoURL': comment.get('videoURL')
             })
         
+        next_cursor = None
+        if len(comments) == limit:
+            last = comments[-1]
+            next_cursor = encode_cursor(last['date'], last['_id'])
+        
         return jsonify({
-            'comments': comments_data
+            'comments': comments_data,
+            'nextCursor': next_cursor
         }), 200
         
     except Exception as e:
@@ -281,27 +406,195 @@ def get_teacher_courses(teacher_id):
 
 @forum_blueprint.route('/lessons-with-forum/<course_id>', methods=['GET'])
 def get_lessons_with_forum(course_id):
+    """
+    Lecciones del curso con foro habilitado y su actividad:
+    hilos, comentarios, hilos sin respuesta y última actividad.
+    """
     try:
         db = current_app.db
         course_oid = ObjectId(course_id)
         
-        # Buscar el curso
-        course = db.courses.find_one({'_id': course_oid})
+        cached = _LESSONS_FORUM_CACHE.get(course_oid)
+        if cached is not None:
+            return jsonify(cached), 200
+        
+        # Buscar el curso (solo el esquema de lecciones)
+        course = db.courses.find_one(
+            {'_id': course_oid},
+            {'lessons._id': 1, 'lessons.name': 1, 'lessons.forumEnabled': 1}
+        )
         if not course:
             return jsonify({'error': 'Curso no encontrado'}), 404
         
         # Filtrar lecciones con forumEnabled: true
+        lessons = [l for l in course.get('lessons', []) if l.get('forumEnabled', False)]
+        
+        # Actividad de todas las lecciones en una sola agregación
+        activity = {}
+        if lessons:
+            activity = {
+                row['_id']: row
+                for row in db.forums.aggregate([
+                    {'$match': {'lessonId': {'$in': [l['_id'] for l in lessons]}}},
+                    {'$project': {
+                        'lessonId': 1,
+                        'comments': {'$ifNull': ['$commentCount', {'$size': {'$ifNull': ['$comments', []]}}]},
+                        'lastActivity': {'$ifNull': ['$lastComment.date', '$creationDate']}
+                    }},
+                    {'$group': {
+                        '_id': '$lessonId',
+                        'threadCount': {'$sum': 1},
+                        'commentCount': {'$sum': '$comments'},
+                        'unansweredCount': {'$sum': {'$cond': [{'$eq': ['$comments', 0]}, 1, 0]}},
+                        'lastActivity': {'$max': '$lastActivity'}
+                    }}
+                ])
+            }
+        
         lessons_with_forum = []
-        for lesson in course.get('lessons', []):
-            if lesson.get('forumEnabled', False):
-                lessons_with_forum.append({
-                    'id': str(lesson['_id']),
-                    'name': lesson['name']
-                })
+        for lesson in lessons:
+            stats = activity.get(lesson['_id'], {})
+            last_activity = stats.get('lastActivity')
+            lessons_with_forum.append({
+                'id': str(lesson['_id']),
+                'name': lesson['name'],
+                'threadCount': stats.get('threadCount', 0),
+                'commentCount': stats.get('commentCount', 0),
+                'unansweredCount': stats.get('unansweredCount', 0),
+                'lastActivity': time_ago(last_activity) if last_activity else None
+            })
         
-        return jsonify({
+        response_data = {
             'lessons': lessons_with_forum
+        }
+        _LESSONS_FORUM_CACHE.set(course_oid, response_data)
+        
+        return jsonify(response_data), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# ============================
+# Búsqueda
+# ============================
+SEARCH_MAX_PAGE = 10   # la búsqueda ordena por relevancia, no se pagina más allá
+SNIPPET_RADIUS = 60    # caracteres alrededor de la primera coincidencia
+
+def _fold(text):
+    """Minúsculas y sin acentos, conservando la longitud (un carácter por carácter)."""
+    folded = []
+    for ch in text.lower():
+        base = unicodedata.normalize('NFKD', ch)
+        folded.append(base[0] if base else ch)
+    return ''.join(folded)
+
+def _search_snippet(content, terms):
+    """Fragmento del texto alrededor de la primera coincidencia y rangos [inicio, fin] a resaltar."""
+    folded = _fold(content)
+    # Los términos se comparan por prefijo para cubrir el stemming del índice de texto
+    stems = [t[:max(3, len(t) - 2)] for t in terms]
+    matches = []
+    for m in re.finditer(r'\w+', folded):
+        word = m.group()
+        if any(word.startswith(stem) for stem in stems):
+            matches.append((m.start(), m.end()))
+    
+    if not matches:
+        return content[:SNIPPET_RADIUS * 2], []
+    
+    start = max(0, matches[0][0] - SNIPPET_RADIUS)
+    end = min(len(content), matches[0][1] + SNIPPET_RADIUS)
+    highlights = [[a - start, b - start] for a, b in matches if a >= start and b <= end]
+    return content[start:end], highlights
+
+@forum_blueprint.route('/search', methods=['GET'])
+def search_forum():
+    """
+    GET /api/forum/search?q=<texto>&lessonId=<id>|courseId=<id>&page=1&limit=20
+    Busca en posts y comentarios (índice de texto), ordenado por relevancia.
+    """
+    try:
+        db = current_app.db
+        query_text = (request.args.get('q') or '').strip()
+        limit = page_limit(request.args.get('limit'))
+        try:
+            page = min(max(1, int(request.args.get('page', 1))), SEARCH_MAX_PAGE)
+        except ValueError:
+            return jsonify({'error': 'page inválido'}), 400
+        
+        if not query_text:
+            return jsonify({'results': [], 'page': page, 'hasMore': False}), 200
+        
+        # Alcance: una lección o todas las lecciones de un curso
+        lesson_id = request.args.get('lessonId')
+        course_id = request.args.get('courseId')
+        if lesson_id:
+            lesson_ids = [ObjectId(lesson_id)]
+        elif course_id:
+            course = db.courses.find_one({'_id': ObjectId(course_id)}, {'lessons._id': 1})
+            if not course:
+                return jsonify({'error': 'Curso no encontrado'}), 404
+            lesson_ids = [l['_id'] for l in course.get('lessons', [])]
+        else:
+            return jsonify({'error': 'Se requiere lessonId o courseId'}), 400
+        
+        # Se piden suficientes resultados de cada colección para armar la página
+        needed = page * limit + 1
+        text_filter = {'$text': {'$search': query_text}, 'lessonId': {'$in': lesson_ids}}
+        score = {'score': {'$meta': 'textScore'}}
+        
+        posts = db.forums.find(
+            text_filter,
+            {**score, 'userId': 1, 'lessonId': 1, 'content': 1, 'videoURL': 1, 'creationDate': 1}
+        ).sort([('score', {'$meta': 'textScore'})]).limit(needed)
+        comments = db.forumComments.find(
+            text_filter,
+            {**score, 'forumId': 1, 'userId': 1, 'lessonId': 1, 'content': 1, 'videoURL': 1, 'date': 1}
+        ).sort([('score', {'$meta': 'textScore'})]).limit(needed)
+        
+        hits = [('post', p) for p in posts] + [('comment', c) for c in comments]
+        hits.sort(key=lambda h: h[1]['score'], reverse=True)
+        page_hits = hits[(page - 1) * limit:page * limit]
+        
+        # Resolver los autores en una sola consulta
+        user_ids = list({doc['userId'] for _, doc in page_hits})
+        names = resolve_user_names(db, user_ids)
+        
+        terms = [_fold(t) for t in re.findall(r'\w+', query_text)]
+        results = []
+        for kind, doc in page_hits:
+            user_name = names.get(doc['userId']) or 'Usuario desconocido'
+            snippet, highlights = _search_snippet(doc['content'], terms)
+            results.append({
+                'type': kind,
+                'forumId': str(doc['_id'] if kind == 'post' else doc['forumId']),
+                'commentId': str(doc['_id']) if kind == 'comment' else None,
+                'lessonId': str(doc['lessonId']),
+                'userName': user_name,
+                'initials': get_initials(user_name),
+                'snippet': snippet,
+                'highlights': highlights,
+                'videoURL': doc.get('videoURL'),
+                'date': time_ago(doc['creationDate'] if kind == 'post' else doc['date']),
+                'score': round(doc['score'], 3)
+            })
+        
+        return jsonify({
+            'results': results,
+            'page': page,
+            'hasMore': len(hits) > page * limit and page < SEARCH_MAX_PAGE
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+# ============================
+# Comandos de mantenimiento
+# ============================
+# flask forum migrate-comments
+@forum_blueprint.cli.command('migrate-comments')
+def migrate_comments():
+    """Mueve los comentarios embebidos en forums a la colección forumComments."""
+    migrated, skipped = _migrate_forum_comments(current_app.db)
+    print(f"Posts migrados: {migrated}")
+    print(f"Posts omitidos (ver log): {skipped}")
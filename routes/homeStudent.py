@@ -1,6 +1,7 @@
 from flask import Blueprint, app, jsonify, current_app, request
 from bson import ObjectId
 from datetime import datetime
+from routes.displayNames import resolve_user_names
 import re
 
 homeStudent_blueprint = Blueprint('homeStudent', __name__)
@@ -103,10 +104,12 @@ def get_recent_course(db, user_oid):
     
     # Si encontró un curso, obtener sus detalles
     if latest_course_id:
-        course = db.courses.find_one({'_id': latest_course_id})
+        course = db.courses.find_one(
+            {'_id': latest_course_id},
+            {'name': 1, 'difficulty': 1, 'lessons._id': 1, 'userId': 1, 'description': 1}
+        )
         if course:
-            teacher = db.users.find_one({'_id': course['userId']})
-            teacher_name = teacher.get('name', 'Profesor desconocido') if teacher else 'Profesor desconocido'
+            teacher_name = resolve_user_names(db, [course['userId']]).get(course['userId']) or 'Profesor desconocido'
             return {
                 'courseName': course.get('name', 'Curso sin nombre'),
                 'difficulty': course.get('difficulty', 1),
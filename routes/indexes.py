@@ -0,0 +1,228 @@
+import logging
+import threading
+from bson import ObjectId
+from datetime import datetime
+from flask import current_app
+from flask.cli import AppGroup
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+# ============================
+# Índices
+# ============================
+# Declaración única de los índices que necesitan las consultas de las rutas.
+# Al arrancar se crean los que falten en un hilo aparte (no bloquea el
+# arranque) y `flask indexes report` compara lo declarado con lo que hay:
+# faltantes, no declarados, sin uso ($indexStats) y planes sin índice (explain).
+# CreateLEARNDB.js crea los mismos índices para una base nueva.
+
+EVENTS_TTL_SECONDS = 3600   # la colección events (EVENTS_BACKEND 'mongo') solo sirve en vivo
+
+INDEXES = {
+    "users": [
+        ([("firebaseUid", ASCENDING)], {"unique": True}),
+        ([("searchTokens", ASCENDING)], {}),
+        ([("searchGrams", ASCENDING)], {}),
+    ],
+    "follows": [
+        ([("follower", ASCENDING), ("followee", ASCENDING)], {"unique": True}),
+        ([("followee", ASCENDING), ("follower", ASCENDING)], {"unique": True}),
+        ([("followee", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("follower", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "courses": [
+        ([("lessons._id", ASCENDING)], {}),
+        ([("userId", ASCENDING), ("language", ASCENDING)], {}),
+        ([("status", ASCENDING), ("language", ASCENDING)], {}),
+    ],
+    "enrolledCourses": [
+        ([("userId", ASCENDING), ("courseId", ASCENDING)], {}),
+        ([("courseId", ASCENDING), ("userId", ASCENDING)], {}),
+    ],
+    "achievements": [
+        ([("type", ASCENDING), ("name", ASCENDING), ("content", ASCENDING)], {}),
+    ],
+    "forums": [
+        ([("lessonId", ASCENDING), ("creationDate", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("content", TEXT)], {"default_language": "spanish"}),
+    ],
+    "forumComments": [
+        ([("forumId", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], {}),
+        ([("content", TEXT)], {"default_language": "spanish"}),
+    ],
+    "news": [
+        ([("userId", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("userId", ASCENDING), ("courseId", ASCENDING), ("kind", ASCENDING), ("date", DESCENDING)],
+         {"partialFilterExpression": {"kind": "activity"}}),
+        ([("kind", ASCENDING), ("date", ASCENDING)], {"partialFilterExpression": {"kind": {"$exists": True}}}),
+    ],
+    "news_likes": [
+        ([("newsId", ASCENDING), ("userId", ASCENDING)], {"unique": True}),
+        ([("userId", ASCENDING), ("newsId", ASCENDING)], {}),
+    ],
+    "newsComments": [
+        ([("newsId", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "newsArchive": [
+        ([("userId", ASCENDING), ("date", DESCENDING)], {}),
+    ],
+    "newsLikesArchive": [
+        ([("newsId", ASCENDING)], {}),
+    ],
+    "newsCommentsArchive": [
+        ([("newsId", ASCENDING)], {}),
+    ],
+    "timelines": [
+        ([("userId", ASCENDING), ("date", DESCENDING), ("newsId", DESCENDING)], {}),
+        ([("userId", ASCENDING), ("newsId", ASCENDING)], {"unique": True}),
+        ([("userId", ASCENDING), ("authorId", ASCENDING)], {}),
+    ],
+    "studentStatistics": [
+        ([("userId", ASCENDING), ("language", ASCENDING)], {"unique": True}),
+    ],
+    "teacherStatistics": [
+        ([("userId", ASCENDING)], {}),
+    ],
+    "events": [
+        ([("date", ASCENDING)], {"expireAfterSeconds": EVENTS_TTL_SECONDS}),
+    ],
+}
+
+_logger = logging.getLogger("routes.indexes")
+
+def index_name(keys):
+    """Mismo nombre por defecto que usan pymongo y mongosh (campo_dirección)."""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+def ensure_indexes(db):
+    """Crea los índices declarados que falten. Devuelve la lista de los creados."""
+    created = []
+    for coll_name, specs in INDEXES.items():
+        coll = db[coll_name]
+        existing = set(coll.index_information()) if coll_name in db.list_collection_names() else set()
+        for keys, options in specs:
+            name = index_name(keys)
+            if name in existing:
+                continue
+            try:
+                coll.create_index(keys, name=name, **options)
+                created.append(f"{coll_name}.{name}")
+            except OperationFailure as e:
+                # mismo índice con otras opciones o datos que violan unique: se reporta, no se borra nada
+                _logger.warning(f"[indexes] no se pudo crear {coll_name}.{name}: {e}")
+    return created
+
+# Consultas representativas de las rutas: (colección, filtro, sort)
+_SAMPLE = ObjectId()
+QUERY_CHECKS = [
+    ("users", {"firebaseUid": "sample"}, None),
+    ("users", {"searchTokens": {"$regex": "^mar"}}, None),
+    ("follows", {"followee": _SAMPLE}, [("createdAt", -1), ("_id", -1)]),
+    ("follows", {"follower": _SAMPLE}, [("createdAt", -1), ("_id", -1)]),
+    ("courses", {"lessons._id": _SAMPLE}, None),
+    ("courses", {"userId": _SAMPLE, "language": False}, None),
+    ("courses", {"status": True, "language": False}, None),
+    ("enrolledCourses", {"userId": _SAMPLE}, None),
+    ("enrolledCourses", {"courseId": _SAMPLE}, None),
+    ("achievements", {"type": False, "name": "sample"}, None),
+    ("forums", {"lessonId": _SAMPLE}, [("creationDate", -1), ("_id", -1)]),
+    ("forumComments", {"forumId": _SAMPLE}, [("date", 1), ("_id", 1)]),
+    ("news", {"userId": _SAMPLE}, [("date", -1), ("_id", -1)]),
+    ("news_likes", {"userId": _SAMPLE, "newsId": {"$in": [_SAMPLE]}}, None),
+    ("newsComments", {"newsId": _SAMPLE}, [("date", -1), ("_id", -1)]),
+    ("timelines", {"userId": _SAMPLE}, [("date", -1), ("newsId", -1)]),
+    ("studentStatistics", {"userId": _SAMPLE}, None),
+]
+
+def plan_stages(plan):
+    """Etapas de un winningPlan de explain(), de la raíz a las hojas."""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+def index_report(db):
+    """
+    {missing, undeclared, unused, badPlans}: índices declarados que no
+    existen, existentes que no están declarados, sin accesos desde el último
+    reinicio del servidor, y consultas de QUERY_CHECKS con COLLSCAN o SORT.
+    """
+    report = {"missing": [], "undeclared": [], "unused": [], "badPlans": []}
+    collections = set(db.list_collection_names())
+
+    for coll_name, specs in INDEXES.items():
+        declared = {index_name(keys) for keys, _ in specs}
+        if coll_name not in collections:
+            report["missing"] += [f"{coll_name}.{n}" for n in sorted(declared)]
+            continue
+        coll = db[coll_name]
+        existing = set(coll.index_information()) - {"_id_"}
+        report["missing"] += [f"{coll_name}.{n}" for n in sorted(declared - existing)]
+        report["undeclared"] += [f"{coll_name}.{n}" for n in sorted(existing - declared)]
+        for stat in coll.aggregate([{"$indexStats": {}}]):
+            if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0:
+                report["unused"].append(f"{coll_name}.{stat['name']}")
+
+    for coll_name, query, sort in QUERY_CHECKS:
+        if coll_name not in collections:
+            continue
+        cursor = db[coll_name].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        stages = plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages or "SORT" in stages:
+            report["badPlans"].append({
+                "collection": coll_name,
+                "filter": str(query),
+                "stages": [s for s in stages if s]
+            })
+    return report
+
+def init_app(app):
+    """Si ENSURE_INDEXES_ON_STARTUP, crea los índices faltantes en un hilo aparte."""
+    app.cli.add_command(indexes_cli)
+    if not app.config.get("ENSURE_INDEXES_ON_STARTUP", True):
+        return
+
+    def run():
+        try:
+            created = ensure_indexes(app.db)
+            if created:
+                _logger.info(f"[indexes] creados: {', '.join(created)}")
+        except Exception:
+            _logger.exception("[indexes] error creando índices")
+
+    threading.Thread(target=run, name="ensure-indexes", daemon=True).start()
+
+# ============================
+# Comandos de mantenimiento
+# ============================
+# flask indexes ensure
+# flask indexes report
+indexes_cli = AppGroup("indexes", help="Índices de MongoDB declarados en routes/indexes.py")
+
+@indexes_cli.command("ensure")
+def ensure_command():
+    """Crea los índices declarados que falten."""
+    created = ensure_indexes(current_app.db)
+    print(f"Índices creados: {len(created)}")
+    for name in created:
+        print(f"  {name}")
+
+@indexes_cli.command("report")
+def report_command():
+    """Muestra índices faltantes, no declarados, sin uso y consultas sin índice."""
+    report = index_report(current_app.db)
+    print(f"Reporte de índices ({datetime.utcnow().isoformat()}Z)")
+    for key, title in (("missing", "Faltantes"), ("undeclared", "No declarados"), ("unused", "Sin uso")):
+        print(f"{title}: {len(report[key])}")
+        for name in report[key]:
+            print(f"  {name}")
+    print(f"Consultas sin índice: {len(report['badPlans'])}")
+    for bad in report["badPlans"]:
+        print(f"  {bad['collection']} {bad['filter']}: {' <- '.join(bad['stages'])}")
+    if report["missing"] or report["badPlans"]:
+        raise SystemExit(1)
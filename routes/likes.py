@@ -0,0 +1,114 @@
+import threading
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from routes.background import BatchWorker
+
+# ============================
+# Likes de noticias
+# ============================
+# La fuente de verdad es news_likes (índice único newsId + userId).
+# El contador news.likes se actualiza en diferido: cada like/unlike suma
+# un delta en memoria (para mostrarlo enseguida) y encola la noticia; un
+# BatchWorker junta las noticias tocadas y escribe su conteo ABSOLUTO desde
+# news_likes con un solo bulk_write. Así muchos likes simultáneos a la misma
+# noticia se convierten en una sola escritura, y como nunca se hace $inc,
+# reconcile_like_counts() (otro proceso, con el servidor corriendo) no se
+# suma con deltas en vuelo.
+
+FLUSH_INTERVAL = 1.0   # segundos entre escrituras de contadores
+FLUSH_BATCH = 500      # deltas máximos por lote
+
+_pending = {}          # newsId -> delta aún no escrito
+_pending_lock = threading.Lock()
+
+def _count_likes(db, news_ids=None):
+    """{newsId: likes} desde news_likes (todas las noticias si news_ids es None)."""
+    pipeline = [{"$group": {"_id": "$newsId", "count": {"$sum": 1}}}]
+    if news_ids is not None:
+        pipeline.insert(0, {"$match": {"newsId": {"$in": news_ids}}})
+    return {row["_id"]: row["count"] for row in db.news_likes.aggregate(pipeline)}
+
+def _flush_deltas(batch):
+    db = batch[0][0]
+    totals = {}
+    for _, news_id, delta in batch:
+        totals[news_id] = totals.get(news_id, 0) + delta
+
+    try:
+        counts = _count_likes(db, list(totals))
+        db.news.bulk_write([
+            UpdateOne({"_id": news_id}, {"$set": {"likes": counts.get(news_id, 0)}})
+            for news_id in totals
+        ], ordered=False)
+    finally:
+        with _pending_lock:
+            for news_id, delta in totals.items():
+                left = _pending.get(news_id, 0) - delta
+                if left:
+                    _pending[news_id] = left
+                else:
+                    _pending.pop(news_id, None)
+
+_WORKER = BatchWorker("news-like-counts", _flush_deltas, batch_size=FLUSH_BATCH, interval=FLUSH_INTERVAL)
+
+def _add_delta(db, news_id, delta):
+    with _pending_lock:
+        _pending[news_id] = _pending.get(news_id, 0) + delta
+    _WORKER.submit((db, news_id, delta))
+
+def pending_likes(news_id):
+    """Delta de likes todavía no escrito en news.likes."""
+    with _pending_lock:
+        return _pending.get(news_id, 0)
+
+def like_count(news_doc):
+    """Contador visible: lo guardado más lo pendiente (nunca negativo)."""
+    return max(0, int(news_doc.get("likes", 0)) + pending_likes(news_doc["_id"]))
+
+def add_like(db, news_id, user_id):
+    """Registra el like. Devuelve False si el usuario ya lo había dado."""
+    try:
+        db.news_likes.insert_one({
+            "newsId": news_id,
+            "userId": user_id,
+            "createdAt": datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return False
+    _add_delta(db, news_id, 1)
+    return True
+
+def remove_like(db, news_id, user_id):
+    """Quita el like. Devuelve False si no existía."""
+    res = db.news_likes.delete_one({"newsId": news_id, "userId": user_id})
+    if not res.deleted_count:
+        return False
+    _add_delta(db, news_id, -1)
+    return True
+
+def liked_news_ids(db, user_id, news_ids):
+    """Subconjunto de news_ids que user_id ha likeado."""
+    return {
+        x["newsId"]
+        for x in db.news_likes.find(
+            {"userId": user_id, "newsId": {"$in": list(news_ids)}},
+            {"newsId": 1, "_id": 0}
+        )
+    }
+
+def reconcile_like_counts(db):
+    """
+    Recalcula news.likes desde news_likes. Se puede correr con el servidor
+    activo: sus escrituras pendientes también son conteos absolutos.
+    Devuelve cuántas noticias se corrigieron.
+    """
+    counts = _count_likes(db)
+    ops = []
+    for doc in db.news.find({}, {"likes": 1}):
+        expected = counts.get(doc["_id"], 0)
+        if doc.get("likes", 0) != expected:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"likes": expected}}))
+    for i in range(0, len(ops), 1000):
+        db.news.bulk_write(ops[i:i + 1000], ordered=False)
+    return len(ops)
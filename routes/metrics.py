@@ -0,0 +1,328 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, g, has_request_context, request
+from pymongo import monitoring
+
+# ============================
+# Métricas de MongoDB por request
+# ============================
+# Un CommandListener de pymongo atribuye cada comando (duración y documentos
+# devueltos) al request de Flask que lo emitió: los listeners se ejecutan en
+# el mismo hilo que la consulta, así que basta con `g`. Los comandos de hilos
+# en segundo plano (BatchWorker, archivado, etc.) no tienen request y no se
+# cuentan. Por endpoint se acumulan histogramas de consultas y de tiempo en
+# base de datos por request; si la misma forma de consulta se repite más de
+# DB_REPEATED_QUERY_THRESHOLD veces en un request se avisa en el log (N+1).
+#
+# También se mide cada request (latencia y código de respuesta por endpoint)
+# y el pool de conexiones de MongoDB; render_metrics() lo expone todo en el
+# formato de texto de Prometheus para /metrics.
+#
+# Los listeners deben pasarse al crear el MongoClient:
+#   MongoClient(..., event_listeners=[command_listener, pool_listener])
+
+ROUND_TRIP_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_logger = logging.getLogger("routes.metrics")
+
+class Histogram:
+    """Histograma acumulado con límites fijos (estilo Prometheus)."""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(límite, acumulado)] incluyendo ('+Inf', total)."""
+        result = []
+        total = 0
+        for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+class EndpointDbStats:
+    def __init__(self):
+        self.requests = 0
+        self.round_trips = Histogram(ROUND_TRIP_BUCKETS)
+        self.db_seconds = Histogram(LATENCY_BUCKETS)
+        self.documents = 0
+        self.failures = 0
+        self.repeated_queries = 0
+
+class RouteStats:
+    def __init__(self):
+        self.responses = {}  # código de estado -> cantidad
+        self.errors = 0      # 5xx o excepción sin manejar
+        self.latency = Histogram(LATENCY_BUCKETS)
+
+DB_STATS = {}     # endpoint -> EndpointDbStats
+ROUTE_STATS = {}  # (endpoint, método) -> RouteStats
+_stats_lock = threading.Lock()
+
+def _shape(value):
+    """Estructura de un filtro con los valores reemplazados por '?'."""
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{k}:{_shape(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        # $and/$or conservan su estructura; una lista de valores ($in) es un solo '?'
+        if value and all(isinstance(v, dict) for v in value):
+            return "[" + ",".join(_shape(v) for v in value) + "]"
+    return "?"
+
+def query_shape(command_name, command):
+    """Forma de un comando: nombre, colección y filtro sin valores."""
+    collection = command.get(command_name)
+    if command_name in ("find", "count", "distinct"):
+        detail = _shape(command.get("filter", command.get("query", {})))
+    elif command_name == "aggregate":
+        detail = _shape(command.get("pipeline", []))
+    elif command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        detail = _shape(statements[0].get("q", {}))
+    elif command_name == "findAndModify":
+        detail = _shape(command.get("query", {}))
+    elif command_name == "getMore":
+        collection = command.get("collection")
+        detail = ""
+    else:
+        detail = ""
+    return f"{command_name} {collection} {detail}".strip()
+
+def _documents_returned(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "value" in reply:  # findAndModify
+        return 1 if reply["value"] else 0
+    return reply.get("n", 0)
+
+class RequestCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        if not has_request_context() or "db_commands" not in g:
+            return
+        g.db_pending[event.request_id] = query_shape(event.command_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, _documents_returned(event.reply), False)
+
+    def failed(self, event):
+        self._finish(event, 0, True)
+
+    def _finish(self, event, documents, failed):
+        if not has_request_context() or "db_commands" not in g:
+            return
+        shape = g.db_pending.pop(event.request_id, event.command_name)
+        g.db_commands.append((shape, event.duration_micros / 1e6, documents, failed))
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Conexiones abiertas, prestadas, en espera y tiempo de espera del pool."""
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.pool_clears = 0
+        self.wait_seconds = Histogram(LATENCY_BUCKETS)
+        self._lock = threading.Lock()
+        self._local = threading.local()  # inicio de la espera del hilo actual
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            if started is not None:
+                self.wait_seconds.observe(time.perf_counter() - started)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+command_listener = RequestCommandListener()
+pool_listener = PoolStatsListener()
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    g.db_commands = []
+    g.db_pending = {}
+
+def _record_status(response):
+    g.response_status = response.status_code
+    return response
+
+def _finish_request(exc=None):
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    endpoint = request.endpoint or "unknown"
+    status = 500 if exc is not None else g.pop("response_status", 500)
+    with _stats_lock:
+        route = ROUTE_STATS.get((endpoint, request.method))
+        if route is None:
+            route = ROUTE_STATS[(endpoint, request.method)] = RouteStats()
+        route.responses[status] = route.responses.get(status, 0) + 1
+        route.errors += 1 if status >= 500 else 0
+        route.latency.observe(time.perf_counter() - started)
+    _finish_db_stats(endpoint)
+
+def _finish_db_stats(endpoint):
+    commands = g.pop("db_commands", None)
+    g.pop("db_pending", None)
+    if commands is None:
+        return
+    threshold = current_app.config.get("DB_REPEATED_QUERY_THRESHOLD", 10)
+
+    per_shape = {}
+    for shape, _, _, _ in commands:
+        per_shape[shape] = per_shape.get(shape, 0) + 1
+    repeated = {shape: n for shape, n in per_shape.items() if n > threshold}
+    for shape, n in repeated.items():
+        _logger.warning(f"[metrics] {endpoint}: la consulta '{shape}' se repitió {n} veces en un request (posible N+1)")
+
+    with _stats_lock:
+        stats = DB_STATS.get(endpoint)
+        if stats is None:
+            stats = DB_STATS[endpoint] = EndpointDbStats()
+        stats.requests += 1
+        stats.round_trips.observe(len(commands))
+        stats.db_seconds.observe(sum(c[1] for c in commands))
+        stats.documents += sum(c[2] for c in commands)
+        stats.failures += sum(1 for c in commands if c[3])
+        stats.repeated_queries += len(repeated)
+
+def init_app(app):
+    """Registra los hooks que abren y cierran la medición de cada request."""
+    app.before_request(_start_request)
+    app.after_request(_record_status)
+    app.teardown_request(_finish_request)
+
+# ============================
+# Formato de texto de Prometheus
+# ============================
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_label(v)}"' for k, v in labels.items()) + "}"
+
+def _metric(lines, name, kind, help_text, samples):
+    """samples: [(etiquetas, valor)]"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(**labels)} {value}")
+
+def _histogram(lines, name, help_text, histograms):
+    """histograms: [(etiquetas, Histogram)]"""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, h in histograms:
+        for bound, total in h.cumulative():
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {total}")
+        lines.append(f"{name}_sum{_labels(**labels)} {h.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {h.count}")
+
+def render_metrics():
+    """Todas las métricas del proceso en el formato de texto de Prometheus."""
+    from routes.cache import CACHES
+    from routes.exercises import SESSIONS, USER_ACTIVE
+
+    lines = []
+    with _stats_lock:
+        routes = sorted(ROUTE_STATS.items())
+        _metric(lines, "learn_http_requests_total", "counter", "Requests por endpoint, método y código", [
+            ({"endpoint": e, "method": m, "status": status}, n)
+            for (e, m), r in routes for status, n in sorted(r.responses.items())
+        ])
+        _metric(lines, "learn_http_errors_total", "counter", "Respuestas 5xx o excepciones por endpoint", [
+            ({"endpoint": e, "method": m}, r.errors) for (e, m), r in routes
+        ])
+        _histogram(lines, "learn_http_request_duration_seconds", "Latencia de los requests", [
+            ({"endpoint": e, "method": m}, r.latency) for (e, m), r in routes
+        ])
+
+        db = sorted(DB_STATS.items())
+        _histogram(lines, "learn_db_round_trips_per_request", "Comandos de MongoDB por request", [
+            ({"endpoint": e}, s.round_trips) for e, s in db
+        ])
+        _histogram(lines, "learn_db_seconds_per_request", "Tiempo en MongoDB por request", [
+            ({"endpoint": e}, s.db_seconds) for e, s in db
+        ])
+        _metric(lines, "learn_db_documents_returned_total", "counter", "Documentos devueltos por MongoDB", [
+            ({"endpoint": e}, s.documents) for e, s in db
+        ])
+        _metric(lines, "learn_db_command_failures_total", "counter", "Comandos de MongoDB fallidos", [
+            ({"endpoint": e}, s.failures) for e, s in db
+        ])
+        _metric(lines, "learn_db_repeated_query_requests_total", "counter", "Requests con una consulta repetida (N+1)", [
+            ({"endpoint": e}, s.repeated_queries) for e, s in db
+        ])
+
+    pool = pool_listener
+    with pool._lock:
+        _metric(lines, "learn_mongo_pool_connections", "gauge", "Conexiones abiertas", [({}, pool.open)])
+        _metric(lines, "learn_mongo_pool_checked_out", "gauge", "Conexiones en uso", [({}, pool.checked_out)])
+        _metric(lines, "learn_mongo_pool_wait_queue", "gauge", "Hilos esperando una conexión", [({}, pool.waiting)])
+        _metric(lines, "learn_mongo_pool_checkout_failures_total", "counter", "Esperas de conexión fallidas",
+                [({}, pool.checkout_failures)])
+        _metric(lines, "learn_mongo_pool_clears_total", "counter", "Veces que se vació el pool", [({}, pool.pool_clears)])
+        _histogram(lines, "learn_mongo_pool_wait_seconds", "Espera para obtener una conexión", [({}, pool.wait_seconds)])
+
+    _metric(lines, "learn_exercise_sessions", "gauge", "Corridas de ejercicios en memoria", [({}, len(SESSIONS))])
+    _metric(lines, "learn_exercise_active_users", "gauge", "Usuarios con una corrida activa", [({}, len(USER_ACTIVE))])
+
+    caches = sorted(CACHES.items())
+    _metric(lines, "learn_cache_entries", "gauge", "Entradas en cache", [({"cache": n}, len(c)) for n, c in caches])
+    _metric(lines, "learn_cache_hits_total", "counter", "Aciertos de cache", [({"cache": n}, c.hits) for n, c in caches])
+    _metric(lines, "learn_cache_misses_total", "counter", "Fallos de cache", [({"cache": n}, c.misses) for n, c in caches])
+    _metric(lines, "learn_cache_hit_ratio", "gauge", "Aciertos / consultas de cache", [
+        ({"cache": n}, round(c.hits / (c.hits + c.misses), 4) if c.hits + c.misses else 0) for n, c in caches
+    ])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,73 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from routes.follows import migrate_follow_arrays
+from routes.studentStatistics import rebuild_student_statistics
+from routes.timeline import rebuild_timelines
+
+# ============================
+# Migraciones de datos al arrancar
+# ============================
+# Pasos que el modelo nuevo necesita sobre datos viejos y que deben correr
+# una sola vez por base, no en cada proceso. Al arrancar, un hilo recorre
+# MIGRATIONS en orden; cada una se reclama insertando su marcador en la
+# colección `migrations` ({_id: nombre, startedAt, doneAt}), así solo la
+# corre el primer proceso (workers, comandos flask). Si falla se borra el
+# marcador y se reintenta en el próximo arranque; si el proceso muere a
+# mitad, se retoma pasado STALE_AFTER. Todas se pueden correr más de una vez
+# y cada una tiene también su comando flask.
+
+STALE_AFTER = timedelta(hours=6)
+
+# (nombre, función(db)) en el orden en que deben correr
+MIGRATIONS = [
+    ("follow-arrays", migrate_follow_arrays),
+    ("timelines", rebuild_timelines),         # después de follow-arrays: usa follows
+    ("student-statistics", rebuild_student_statistics),
+]
+
+_logger = logging.getLogger("routes.migrations")
+
+def _claim(db, name, now):
+    """True si este proceso debe correr la migración `name`."""
+    try:
+        db.migrations.insert_one({"_id": name, "startedAt": now})
+        return True
+    except DuplicateKeyError:
+        # un intento que quedó a medias (proceso caído) se retoma
+        res = db.migrations.update_one(
+            {"_id": name, "doneAt": {"$exists": False}, "startedAt": {"$lt": now - STALE_AFTER}},
+            {"$set": {"startedAt": now}}
+        )
+        return res.modified_count == 1
+
+def run_once(db, name, fn):
+    """Corre fn(db) si la migración no se corrió (ni se está corriendo) en esta base."""
+    now = datetime.utcnow()
+    if not _claim(db, name, now):
+        return False
+    try:
+        result = fn(db)
+    except Exception:
+        db.migrations.delete_one({"_id": name, "startedAt": now})
+        raise
+    db.migrations.update_one({"_id": name}, {"$set": {"doneAt": datetime.utcnow(), "result": result}})
+    _logger.info(f"[migrations] {name}: {result}")
+    return True
+
+def init_app(app):
+    """Si RUN_MIGRATIONS_ON_STARTUP, corre en un hilo aparte las migraciones pendientes."""
+    if not app.config.get("RUN_MIGRATIONS_ON_STARTUP", True):
+        return
+
+    def run():
+        for name, fn in MIGRATIONS:
+            try:
+                run_once(app.db, name, fn)
+            except Exception:
+                # las siguientes pueden depender de esta: se reintenta todo en el próximo arranque
+                _logger.exception(f"[migrations] error en {name}")
+                return
+
+    threading.Thread(target=run, name="startup-migrations", daemon=True).start()
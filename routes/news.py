@@ -1,8 +1,18 @@
 from flask import Blueprint, request, jsonify, current_app
+import click
 from bson import ObjectId
 from bson.errors import InvalidId
 from datetime import datetime
 from routes.exercises import _create_news_activity_result
+from routes.events import publish
+from routes.timeline import rebuild_timelines
+from routes.displayNames import resolve_user_names, user_public_info
+from routes.embeddedComments import LEGACY_PROBE, migrate_embedded_comments
+from routes.follows import following_ids
+from routes.pagination import encode_cursor, keyset_filter, page_limit
+from routes.indexes import plan_stages
+from routes.retention import archive_old_news, classify_legacy_news
+from routes.likes import add_like, remove_like, like_count, liked_news_ids, reconcile_like_counts
 
 news_bp = Blueprint("news", __name__)
 
@@ -21,8 +31,8 @@ news_bp = Blueprint("news", __name__)
 
 # FEED
 # curl "http://localhost:5000/api/news/feed?userId=<USER_ID>" &limit=10 <- se puede poner un limite
-# paginación hacia atrás (más antiguas):
-# curl "http://localhost:5000/api/news/feed?userId=<USER_ID>&limit=10&before=<NEWS_ID>"
+# paginación hacia atrás (más antiguas), con el nextCursor de la respuesta anterior:
+# curl "http://localhost:5000/api/news/feed?userId=<USER_ID>&limit=10&cursor=<NEXT_CURSOR>"
 
 # Like (+1)
 # curl -X POST http://localhost:5000/api/news/like \
@@ -40,8 +50,8 @@ news_bp = Blueprint("news", __name__)
 
 #COMMENTS
 #curl "http://localhost:5000/api/news/comments?newsId=<NEWS_ID>" &limit=10 <- se puede poner un limite
-# Paginación:
-#curl "http://localhost:5000/api/news/comments?newsId=<NEWS_ID>&limit=10&before=<COMMENT_ID>"
+# Paginación (nextCursor de la respuesta anterior):
+#curl "http://localhost:5000/api/news/comments?newsId=<NEWS_ID>&limit=10&cursor=<NEXT_CURSOR>"
 
 # ============================
 # Helpers
@@ -56,61 +66,23 @@ def _to_oid(v, name="id"):
             raise ValueError(f"invalid {name}")
     raise ValueError(f"invalid {name}")
 
-def _initials_from_name(name: str) -> str:
-    if not isinstance(name, str) or not name.strip():
-        return "US"
-    parts = [p for p in name.strip().split() if p]
-    ini = "".join(p[0] for p in parts[:2]).upper()
-    return ini or "US"
+FEED_TIMELINE_SORT = [("date", -1), ("newsId", -1)]
+FEED_NEWS_SORT = [("date", -1), ("_id", -1)]
 
-def _user_public_info(db, user_id):
+def _feed_queries(user_id, pull_authors, cursor=None):
     """
-    Devuelve un objeto compacto para UI con id, name e initials.
+    Filtros del feed: (timelines, news de autores fan-out on read o None).
+    El cursor (date, _id) se aplica como rango compuesto en el mismo orden
+    que los índices timelines (userId, date, newsId) y news (userId, date, _id),
+    así no hay SORT en memoria. Lanza ValueError si el cursor no es válido.
     """
-    u = db.users.find_one(
-        {"_id": user_id},
-        {"name": 1, "firstName": 1, "lastName": 1, "email": 1}
-    ) or {}
-
-    # 1) name raíz
-    nm = (u.get("name") or "").strip()
-    if nm:
-        display = nm
-    else:
-        # 2) first + last
-        fn = (u.get("firstName") or "").strip()
-        ln = (u.get("lastName") or "").strip()
-        full = f"{fn} {ln}".strip()
-        if full:
-            display = full
-        else:
-            # 3) email o fallback
-            em = (u.get("email") or "").strip()
-            display = em if em else "Usuario"
-
-    return {
-        "id": str(user_id),
-        "name": display,
-        "initials": _initials_from_name(display),
-    }
-
-def _get_following_ids(db, user_oid: ObjectId):
-    u = db.users.find_one({"_id": user_oid}, {
-        "information.following": 1,
-        "following": 1,
-        "follows": 1
-    }) or {}
-    ids = []
-    info = (u or {}).get("information", {}) or {}
-    for arr in (info.get("following"), u.get("following"), u.get("follows")):
-        if isinstance(arr, list):
-            for x in arr:
-                try:
-                    ids.append(_to_oid(x))
-                except Exception:
-                    continue
-            break  # usa el primer campo válido que exista
-    return list({i for i in ids})  # únicos
+    tq = {"userId": user_id}
+    pq = {"userId": {"$in": pull_authors}} if pull_authors else None
+    if cursor:
+        tq.update(keyset_filter(cursor, "date", id_field="newsId"))
+        if pq:
+            pq.update(keyset_filter(cursor, "date"))
+    return tq, pq
 
 # ============================
 # Endpoints
@@ -123,46 +95,79 @@ def feed_following():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-    limit = min(int(request.args.get("limit", 20)), 50)
-    following = _get_following_ids(db, user_id) or []
+    limit = page_limit(request.args.get("limit"))
+    following = following_ids(db, user_id)
     if user_id not in following:
         following.append(user_id)
 
-    q = {"userId": {"$in": following}}
+    cursor = request.args.get("cursor")
     before = request.args.get("before")
-    if before:
-        q["_id"] = {"$lt": _to_oid(before, "before")}
+    if before and not cursor:
+        # clientes anteriores: before=<newsId> equivale al cursor de esa noticia
+        try:
+            before_doc = db.news.find_one({"_id": _to_oid(before, "before")}, {"date": 1})
+        except ValueError as e:
+            return jsonify({"error": f"{e}; use cursor (nextCursor)"}), 400
+        if not before_doc:
+            return jsonify({"error": "before not found; use cursor (nextCursor)"}), 400
+        cursor = encode_cursor(before_doc["date"], before_doc["_id"])
 
-    # 1) lee docs primero (no consumas cursor dos veces)
-    docs = list(
-        db.news.find(q)
-        .sort([("date", -1), ("_id", -1)])
+    try:
+        pull_authors = [
+            u["_id"] for u in db.users.find({"_id": {"$in": following}, "fanoutOnRead": True}, {"_id": 1})
+        ]
+        tq, pq = _feed_queries(user_id, pull_authors, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 1) timeline precalculado (fan-out on write): rango del índice (userId, date, newsId)
+    refs = [
+        (e["date"], e["newsId"])
+        for e in db.timelines.find(tq, {"date": 1, "newsId": 1, "_id": 0})
+        .sort(FEED_TIMELINE_SORT)
         .limit(limit)
-    )
+    ]
 
-    # 2) arma set de likes del usuario para estas news
-    news_ids = [d["_id"] for d in docs]
-    liked_set = {
-        x["newsId"]
-        for x in db.news_likes.find(
-            {"userId": user_id, "newsId": {"$in": news_ids}},
-            {"newsId": 1, "_id": 0}
-        )
-    }
+    # sin timeline todavía (datos anteriores, aún no reconstruido): todo fan-out on read
+    if not refs and not db.timelines.find_one({"userId": user_id}, {"_id": 1}):
+        pq = _feed_queries(user_id, following, cursor)[1]
+
+    # 2) autores con muchos seguidores no se reparten: se leen de news (fan-out on read)
+    if pq:
+        refs += [
+            (n["date"], n["_id"])
+            for n in db.news.find(pq, {"date": 1}).sort(FEED_NEWS_SORT).limit(limit)
+        ]
+
+    # 3) mezcla ordenada (sin repetidos) y lee las noticias de la página
+    page_refs = sorted(set(refs), reverse=True)[:limit]
+    page_ids = [nid for _, nid in page_refs]
+    # noticias sin migrar: solo el último comentario embebido
+    by_id = {d["_id"]: d for d in db.news.find({"_id": {"$in": page_ids}}, {"comments": {"$slice": -1}})}
+    docs = [by_id[nid] for nid in page_ids if nid in by_id]
+
+    # 4) arma set de likes del usuario para estas news
+    liked_set = liked_news_ids(db, user_id, [d["_id"] for d in docs])
+
+    # 5) último comentario de cada noticia y nombres de todos los usuarios en lote
+    last_by_news = {}
+    for doc in docs:
+        last = doc.get("lastComment") or (doc.get("comments") or [None])[-1]
+        if last:
+            last_by_news[doc["_id"]] = last
+    names = resolve_user_names(
+        db,
+        [d["userId"] for d in docs] + [c.get("userId") for c in last_by_news.values()]
+    )
 
     items = []
     for doc in docs:
-        author = _user_public_info(db, doc["userId"])
+        author = user_public_info(db, doc["userId"], names)
 
-        # (opcional) último comentario si ya lo añadiste
         last_comment = None
-        comments = doc.get("comments") or []
-        if comments:
-            last = max(
-                comments,
-                key=lambda c: ((c.get("date") or datetime.min), c.get("_id"))
-            )
-            uinfo = _user_public_info(db, last.get("userId")) if last.get("userId") else None
+        last = last_by_news.get(doc["_id"])
+        if last:
+            uinfo = user_public_info(db, last.get("userId"), names) if last.get("userId") else None
             last_comment = {
                 "_id": str(last.get("_id")),
                 "comment": last.get("comment"),
@@ -180,13 +185,17 @@ def feed_following():
             "author": author,
             "title": doc.get("title"),
             "description": doc.get("description"),
-            "likes": int(doc.get("likes", 0)),
+            "likes": like_count(doc),
             "likedByMe": (doc["_id"] in liked_set),  # 👈 AQUÍ
             "date": doc.get("date").isoformat() + "Z" if doc.get("date") else None,
             "lastComment": last_comment,
         })
 
-    return jsonify({"items": items}), 200
+    next_cursor = None
+    if len(page_refs) == limit:
+        next_cursor = encode_cursor(*page_refs[-1])
+
+    return jsonify({"items": items, "nextCursor": next_cursor}), 200
 
 @news_bp.route("/like", methods=["POST"])
 def like_news():
@@ -202,34 +211,31 @@ def like_news():
     if action not in ("like", "unlike"):
         return jsonify({"error": "action must be 'like' or 'unlike'"}), 400
 
-    likes_coll = db.news_likes
-    news_coll  = db.news
-
+    # el like queda registrado en news_likes; el contador se escribe en diferido
     if action == "like":
-        # intenta crear el like (único). Si ya existe, no toques el contador
-        try:
-            likes_coll.insert_one({
-                "newsId": news_id,
-                "userId": user_id,
-                "createdAt": datetime.utcnow()
-            })
-            news_coll.update_one({"_id": news_id}, {"$inc": {"likes": 1}})
-            liked = True
-        except Exception:
-            # índice único evita duplicado; si falló, ya estaba likeado
-            liked = True
+        changed = add_like(db, news_id, user_id)
+        liked = True
     else:
-        # unlike: si existía, bórralo y decrementa
-        res = likes_coll.delete_one({"newsId": news_id, "userId": user_id})
-        if res.deleted_count:
-            news_coll.update_one(
-                {"_id": news_id, "likes": {"$gt": 0}},
-                {"$inc": {"likes": -1}}
-            )
+        changed = remove_like(db, news_id, user_id)
         liked = False
 
-    doc = news_coll.find_one({"_id": news_id}, {"likes": 1})
-    return jsonify({"likes": int(doc.get("likes", 0)) if doc else 0, "likedByMe": liked}), 200
+    doc = db.news.find_one({"_id": news_id}, {"likes": 1, "userId": 1})
+    likes = like_count(doc) if doc else 0
+
+    # avisar al autor de la noticia
+    if changed and doc and doc.get("userId") != user_id:
+        publish(f"user:{doc['userId']}", "news.like", {
+            "newsId": str(news_id),
+            "userId": str(user_id),
+            "action": action,
+            "likes": likes
+        })
+
+    return jsonify({"likes": likes, "likedByMe": liked}), 200
+
+def _migrate_news_comments(db, query=None):
+    """Pasa los comentarios embebidos de las noticias de `query` a newsComments."""
+    return migrate_embedded_comments(db, "news", "newsComments", "newsId", query=query)
 
 @news_bp.route("/comment", methods=["POST"])
 def comment_news():
@@ -256,27 +262,39 @@ def comment_news():
         "userId": user_id,
         "date": datetime.utcnow()
     }
-    res = db.news.update_one({"_id": news_id}, {"$push": {"comments": newc}})
-    if res.matched_count == 0:
+    # contador y último comentario desnormalizados en la noticia
+    news_doc = db.news.find_one_and_update(
+        {"_id": news_id},
+        {"$inc": {"commentCount": 1}, "$set": {"lastComment": newc}},
+        projection={"userId": 1, **LEGACY_PROBE}
+    )
+    if not news_doc:
         return jsonify({"error": "news not found"}), 404
+    db.newsComments.insert_one({**newc, "newsId": news_id})
+    # noticia con comentarios embebidos: migrarla recalcula el contador con todos
+    if "comments" in news_doc:
+        _migrate_news_comments(db, {"_id": news_id})
+
+    user_brief = user_public_info(db, user_id)
+    payload = {
+        "_id": str(newc["_id"]),
+        "comment": newc["comment"],
+        "userId": str(newc["userId"]),
+        "user": user_brief,
+        "date": newc["date"].isoformat() + "Z"
+    }
 
-    user_brief = _user_public_info(db, user_id)
+    # avisar al autor de la noticia
+    if news_doc.get("userId") != user_id:
+        publish(f"user:{news_doc['userId']}", "news.comment", {"newsId": str(news_id), "comment": payload})
 
-    return jsonify({
-        "comment": {
-            "_id": str(newc["_id"]),
-            "comment": newc["comment"],
-            "userId": str(newc["userId"]),
-            "user": user_brief,
-            "date": newc["date"].isoformat() + "Z"
-        }
-    }), 200
+    return jsonify({"comment": payload}), 200
 
 @news_bp.route("/comments", methods=["GET"])
 def get_news_comments():
     """
-    GET /api/news/comments?newsId=<id>&limit=20&before=<commentId>
-    Devuelve los comentarios de una noticia (paginados, más recientes primero).
+    GET /api/news/comments?newsId=<id>&limit=20&cursor=<nextCursor>
+    Devuelve los comentarios de una noticia (paginados por cursor, más recientes primero).
     """
     db = current_app.db
     try:
@@ -284,38 +302,30 @@ def get_news_comments():
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
-    limit = min(int(request.args.get("limit", 20)), 50)
-    before = request.args.get("before")
-
-    pipeline = [
-        {"$match": {"_id": news_id}},
-        {"$unwind": "$comments"},
-    ]
+    limit = page_limit(request.args.get("limit"))
 
-    if before:
+    # rango del índice (newsId, date, _id): costo constante por página
+    query = {"newsId": news_id}
+    cursor = request.args.get("cursor")
+    if cursor:
         try:
-            before_id = _to_oid(before, "before")
-            pipeline.append({"$match": {"comments._id": {"$lt": before_id}}})
-        except Exception as e:
+            query.update(keyset_filter(cursor, "date"))
+        except ValueError as e:
             return jsonify({"error": str(e)}), 400
+    elif db.news.find_one({"_id": news_id, "comments": {"$exists": True}}, {"_id": 1}):
+        # noticia con comentarios embebidos: se migra al abrir la primera página
+        _migrate_news_comments(db, {"_id": news_id})
 
-    pipeline.extend([
-        {"$sort": {"comments.date": -1, "comments._id": -1}},
-        {"$limit": limit},
-        {"$project": {
-            "_id": 0,
-            "commentId": "$comments._id",
-            "userId": "$comments.userId",
-            "comment": "$comments.comment",
-            "date": "$comments.date"
-        }}
-    ])
-
-    rows = list(db.news.aggregate(pipeline))
+    rows = list(
+        db.newsComments.find(query, {"userId": 1, "comment": 1, "date": 1})
+        .sort([("date", -1), ("_id", -1)])
+        .limit(limit)
+    )
+    names = resolve_user_names(db, [r.get("userId") for r in rows if isinstance(r.get("userId"), ObjectId)])
     items = []
     for r in rows:
         uid = r.get("userId")
-        user_info = _user_public_info(db, uid) if isinstance(uid, ObjectId) else None
+        user_info = user_public_info(db, uid, names) if isinstance(uid, ObjectId) else None
         if user_info:
             display_name = user_info.get("name") or user_info.get("displayName") or "Usuario"
             initials = user_info.get("initials") or "US"
@@ -324,7 +334,7 @@ def get_news_comments():
             initials = "US"
 
         items.append({
-            "_id": str(r.get("commentId")),
+            "_id": str(r["_id"]),
             "comment": r.get("comment"),
             "userId": str(uid) if uid else None,
             "displayName": display_name,  
@@ -332,7 +342,12 @@ def get_news_comments():
             "date": r.get("date").isoformat() + "Z" if r.get("date") else None
         })
 
-    return jsonify({"items": items}), 200
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(last["date"], last["_id"])
+
+    return jsonify({"items": items, "nextCursor": next_cursor}), 200
 
 @news_bp.route("/activity", methods=["POST"])
 def create_activity_news():
@@ -371,4 +386,75 @@ def create_activity_news():
     except Exception:
         current_app.logger.exception("Error creando noticia de resultado de actividad")
 
-    return jsonify({"ok": True}), 200
\ No newline at end of file
+    return jsonify({"ok": True}), 200
+
+# ============================
+# Comandos de mantenimiento
+# ============================
+# flask news rebuild-timelines
+# flask news reconcile-likes
+# flask news migrate-comments
+# flask news explain-feed <USER_ID> [--cursor <NEXT_CURSOR>]
+# flask news archive [--days 90] [--classify-legacy]
+@news_bp.cli.command("rebuild-timelines")
+def rebuild_all_timelines():
+    """Reconstruye los timelines de todos los usuarios desde la colección news."""
+    count = rebuild_timelines(current_app.db)
+    print(f"Timelines reconstruidos: {count}")
+
+@news_bp.cli.command("reconcile-likes")
+def reconcile_likes():
+    """Recalcula news.likes desde news_likes."""
+    fixed = reconcile_like_counts(current_app.db)
+    print(f"Contadores de likes corregidos: {fixed}")
+
+@news_bp.cli.command("migrate-comments")
+def migrate_comments():
+    """Mueve los comentarios embebidos en news a la colección newsComments."""
+    migrated, skipped = _migrate_news_comments(current_app.db)
+    print(f"Noticias migradas: {migrated}")
+    print(f"Noticias omitidas (ver log): {skipped}")
+
+@news_bp.cli.command("explain-feed")
+@click.argument("user_id")
+@click.option("--cursor", default=None, help="nextCursor de una página del feed")
+@click.option("--limit", default=20)
+def explain_feed(user_id, cursor, limit):
+    """Muestra los planes de las consultas del feed y avisa si hay SORT en memoria."""
+    db = current_app.db
+    user_oid = _to_oid(user_id, "userId")
+    following = following_ids(db, user_oid) + [user_oid]
+    pull_authors = [
+        u["_id"] for u in db.users.find({"_id": {"$in": following}, "fanoutOnRead": True}, {"_id": 1})
+    ]
+    tq, pq = _feed_queries(user_oid, pull_authors, cursor)
+
+    checks = [("timelines", db.timelines.find(tq).sort(FEED_TIMELINE_SORT).limit(limit))]
+    if pq:
+        checks.append(("news", db.news.find(pq).sort(FEED_NEWS_SORT).limit(limit)))
+
+    ok = True
+    for name, query in checks:
+        explain = query.explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        stats = explain.get("executionStats", {})
+        blocking = "SORT" in stages
+        ok = ok and not blocking
+        print(f"{name}: {' <- '.join(s for s in stages if s)}")
+        if stats:
+            print(f"  docs examinados: {stats.get('totalDocsExamined')}, claves: {stats.get('totalKeysExamined')}")
+        if blocking:
+            print("  AVISO: SORT en memoria, falta el índice compuesto")
+    if not ok:
+        raise SystemExit(1)
+
+@news_bp.cli.command("archive")
+@click.option("--days", type=int, default=None, help="por defecto NEWS_RETENTION_DAYS")
+@click.option("--classify-legacy", is_flag=True, help="asigna kind a noticias automáticas antiguas")
+def archive_news(days, classify_legacy):
+    """Mueve las noticias automáticas antiguas (con likes y comentarios) a newsArchive."""
+    db = current_app.db
+    if classify_legacy:
+        print(f"Noticias clasificadas: {classify_legacy_news(db)}")
+    days = days if days is not None else current_app.config.get("NEWS_RETENTION_DAYS", 90)
+    print(f"Noticias archivadas: {archive_old_news(db, days)}")
@@ -0,0 +1,45 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+import base64
+
+# ============================
+# Paginación por cursor (keyset)
+# ============================
+# El cursor es opaco para el cliente: codifica (fecha, _id) del último
+# elemento de la página para continuar desde ahí sin usar skip().
+
+_EPOCH = datetime(1970, 1, 1)
+
+def encode_cursor(date, oid):
+    ms = int((date - _EPOCH) / timedelta(milliseconds=1))
+    raw = f"{ms}:{oid}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Devuelve (datetime, ObjectId). Lanza ValueError si el cursor no es válido."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ms, oid = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        return _EPOCH + timedelta(milliseconds=int(ms)), ObjectId(oid)
+    except (ValueError, TypeError, InvalidId, UnicodeDecodeError):
+        raise ValueError("invalid cursor")
+
+def keyset_filter(cursor, date_field, id_field="_id", descending=True):
+    """
+    Predicado de rango compuesto sobre (date_field, id_field) que continúa
+    después del cursor en el mismo orden del sort.
+    """
+    date, oid = decode_cursor(cursor)
+    op = "$lt" if descending else "$gt"
+    return {"$or": [
+        {date_field: {op: date}},
+        {date_field: date, id_field: {op: oid}},
+    ]}
+
+def page_limit(value, default=20, maximum=50):
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from routes.bulkInserts import insert_ignoring_duplicates
+
+# ============================
+# Retención de noticias
+# ============================
+# Las noticias automáticas (kind en ARCHIVED_KINDS) con más de
+# NEWS_RETENTION_DAYS días se mueven a newsArchive junto con sus likes
+# (newsLikesArchive) y comentarios (newsCommentsArchive), y se quitan de los
+# timelines. Las noticias sin kind o de otros tipos se conservan.
+# Cada pasada trabaja en lotes: primero copia (idempotente) y luego borra
+# solo lo que se copió, así una pasada interrumpida o con errores se puede
+# repetir sin perder datos.
+
+ARCHIVED_KINDS = ("activity", "unsubscribe")
+ARCHIVE_BATCH = 500
+ARCHIVE_PAUSE = 0.2   # segundos entre lotes para no saturar la base
+
+_logger = logging.getLogger("routes.retention")
+
+def _move(source, target, news_ids):
+    """Copia a target los documentos de source de esas noticias y borra solo los copiados."""
+    docs = list(source.find({"newsId": {"$in": news_ids}}))
+    # duplicados = ya copiados en una pasada anterior; cualquier otro error corta antes de borrar
+    insert_ignoring_duplicates(target, docs)
+    if docs:
+        source.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+
+def _archive_batch(db, news_docs):
+    ids = [n["_id"] for n in news_docs]
+    now = datetime.utcnow()
+
+    insert_ignoring_duplicates(db.newsArchive, [{**n, "archivedAt": now} for n in news_docs])
+    _move(db.news_likes, db.newsLikesArchive, ids)
+    _move(db.newsComments, db.newsCommentsArchive, ids)
+
+    db.timelines.delete_many({"newsId": {"$in": ids}})
+    db.news.delete_many({"_id": {"$in": ids}})
+
+    # likes/comentarios escritos mientras se archivaba el lote
+    _move(db.news_likes, db.newsLikesArchive, ids)
+    _move(db.newsComments, db.newsCommentsArchive, ids)
+
+def archive_old_news(db, days, batch_size=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE):
+    """Archiva las noticias automáticas anteriores a `days` días. Devuelve cuántas movió."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    query = {"kind": {"$in": list(ARCHIVED_KINDS)}, "date": {"$lt": cutoff}}
+    moved = 0
+    while True:
+        batch = list(db.news.find(query).sort("date", 1).limit(batch_size))
+        if not batch:
+            return moved
+        _archive_batch(db, batch)
+        moved += len(batch)
+        if pause:
+            time.sleep(pause)
+
+def classify_legacy_news(db):
+    """
+    Asigna kind a noticias automáticas creadas antes de que existiera el campo,
+    según el formato de sus títulos. Devuelve cuántas actualizó.
+    """
+    rules = (
+        ("unsubscribe", r" dejó el curso "),
+        ("activity", r" obtuvo \d+/\d+ en la lección .* del curso "),
+    )
+    updated = 0
+    for kind, pattern in rules:
+        res = db.news.update_many(
+            {"kind": {"$exists": False}, "title": {"$regex": pattern}},
+            {"$set": {"kind": kind}}
+        )
+        updated += res.modified_count
+    return updated
+
+def init_app(app):
+    """
+    Si NEWS_ARCHIVE_INTERVAL_HOURS > 0 arranca un hilo que archiva
+    periódicamente con NEWS_RETENTION_DAYS. Si no, usar `flask news archive`.
+    """
+    hours = app.config.get("NEWS_ARCHIVE_INTERVAL_HOURS", 0)
+    if not hours:
+        return
+
+    def run():
+        while True:
+            try:
+                moved = archive_old_news(app.db, app.config.get("NEWS_RETENTION_DAYS", 90))
+                if moved:
+                    _logger.info(f"[retention] noticias archivadas: {moved}")
+            except Exception:
+                _logger.exception("[retention] error archivando noticias")
+            time.sleep(hours * 3600)
+
+    threading.Thread(target=run, name="news-retention", daemon=True).start()
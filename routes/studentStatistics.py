@@ -0,0 +1,199 @@
+import logging
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from routes.bulkInserts import only_duplicates
+
+# ============================
+# Estadísticas de estudiantes (modelo de lectura)
+# ============================
+# Un documento por usuario y lengua en studentStatistics:
+# {
+#   userId, language (False LESCO / True LIBRAS),
+#   courses: { "<courseId>": { completed, lessons, activities, attemptsUsed, attemptCount } },
+#   totals:  { coursesCompleted, lessons, activities, attemptsUsed, attemptCount },
+#   updatedAt
+# }
+# Cada escritura sobre una inscripción recalcula SOLO el aporte de ese curso
+# y los totales se derivan de `courses` en la misma actualización, así que
+# repetir una actualización nunca duplica conteos. El primer documento de un
+# usuario y lengua se arma con todas sus inscripciones en esa lengua. La
+# reconstrucción completa corre una vez por base al arrancar
+# (routes/migrations.py) o con `flask user rebuild-student-statistics`.
+# Las rutas actualizan con safe_refresh_course_stats/safe_remove_course_stats:
+# un error en las estadísticas se registra y no cambia la respuesta.
+
+_COURSE_FIELDS = {"language": 1, "lessons._id": 1, "lessons.questionCount": 1, "lessons.attempts": 1}
+_ENROLLMENT_FIELDS = {
+    "userId": 1, "courseId": 1, "completionDate": 1,
+    "completedLessons.lessonId": 1, "completedLessons.remainingAttempts": 1
+}
+_TOTAL_KEYS = ("lessons", "activities", "attemptsUsed", "attemptCount")
+
+_logger = logging.getLogger("routes.studentStatistics")
+
+def course_contribution(enrollment, course):
+    """Aporte de una inscripción a las estadísticas de su lengua."""
+    lessons_by_id = {l["_id"]: l for l in course.get("lessons", [])}
+    completed_lessons = enrollment.get("completedLessons", [])
+    contribution = {
+        "completed": enrollment.get("completionDate") is not None,
+        "lessons": len(completed_lessons),
+        "activities": 0,
+        "attemptsUsed": 0,
+        "attemptCount": 0,
+    }
+    for lesson in completed_lessons:
+        original_lesson = lessons_by_id.get(lesson.get("lessonId"))
+        if original_lesson:
+            contribution["activities"] += original_lesson.get("questionCount", 0)
+            contribution["attemptsUsed"] += original_lesson.get("attempts", 0) - lesson.get("remainingAttempts", 0)
+            contribution["attemptCount"] += 1
+    return contribution
+
+def _totals_stage():
+    entries = {"$objectToArray": {"$ifNull": ["$courses", {}]}}
+    initial = {"coursesCompleted": 0, **{k: 0 for k in _TOTAL_KEYS}}
+    step = {"coursesCompleted": {"$add": ["$$value.coursesCompleted", {"$cond": ["$$this.v.completed", 1, 0]}]}}
+    step.update({k: {"$add": [f"$$value.{k}", f"$$this.v.{k}"]} for k in _TOTAL_KEYS})
+    return {"$set": {
+        "totals": {"$reduce": {"input": entries, "initialValue": initial, "in": step}},
+        "updatedAt": datetime.utcnow()
+    }}
+
+def _course_update(course_id, contribution):
+    """Pipeline que reemplaza (o quita, si contribution es None) el aporte del curso y recalcula totales."""
+    key = f"courses.{course_id}"
+    first = {"$unset": key} if contribution is None else {"$set": {key: {"$literal": contribution}}}
+    return [first, _totals_stage()]
+
+def _full_update(by_course, now):
+    """$set de un documento completo a partir de {courseId: aporte}."""
+    totals = {"coursesCompleted": sum(1 for c in by_course.values() if c["completed"])}
+    totals.update({k: sum(c[k] for c in by_course.values()) for k in _TOTAL_KEYS})
+    return {"$set": {"courses": by_course, "totals": totals, "updatedAt": now}}
+
+def _seed_language_stats(db, user_oid, language):
+    """Arma el documento de (usuario, lengua) con todas sus inscripciones en esa lengua."""
+    enrollments = list(db.enrolledCourses.find({"userId": user_oid}, _ENROLLMENT_FIELDS))
+    courses = {
+        c["_id"]: c
+        for c in db.courses.find(
+            {"_id": {"$in": [e["courseId"] for e in enrollments]}, "language": language}, _COURSE_FIELDS
+        )
+    }
+    by_course = {
+        str(e["courseId"]): course_contribution(e, courses[e["courseId"]])
+        for e in enrollments if e["courseId"] in courses
+    }
+    db.studentStatistics.update_one(
+        {"userId": user_oid, "language": language},
+        _full_update(by_course, datetime.utcnow()),
+        upsert=True
+    )
+
+def refresh_course_stats(db, user_oid, course_id):
+    """
+    Recalcula el aporte de (usuario, curso) desde enrolledCourses.
+    Si ya no está inscrito, quita el curso de sus estadísticas.
+    """
+    course = db.courses.find_one({"_id": course_id}, _COURSE_FIELDS)
+    if not course or course.get("language") not in (False, True):
+        return
+    stats_key = {"userId": user_oid, "language": course["language"]}
+    if not db.studentStatistics.find_one(stats_key, {"_id": 1}):
+        # sin documento todavía: uno con un solo curso dejaría fuera a los demás
+        _seed_language_stats(db, user_oid, course["language"])
+        return
+    enrollment = db.enrolledCourses.find_one({"userId": user_oid, "courseId": course_id}, _ENROLLMENT_FIELDS)
+    contribution = course_contribution(enrollment, course) if enrollment else None
+    db.studentStatistics.update_one(stats_key, _course_update(course_id, contribution), upsert=True)
+
+def remove_course_stats(db, course_id, language):
+    """Quita un curso eliminado de las estadísticas de todos sus estudiantes."""
+    db.studentStatistics.update_many(
+        {"language": language, f"courses.{course_id}": {"$exists": True}},
+        _course_update(course_id, None)
+    )
+
+def safe_refresh_course_stats(db, user_oid, course_id):
+    """refresh_course_stats que nunca interrumpe la respuesta."""
+    try:
+        refresh_course_stats(db, user_oid, course_id)
+    except Exception:
+        _logger.exception("[studentStatistics] error actualizando estadísticas")
+
+def safe_remove_course_stats(db, course_id, language):
+    """remove_course_stats que nunca interrumpe la respuesta."""
+    try:
+        remove_course_stats(db, course_id, language)
+    except Exception:
+        _logger.exception("[studentStatistics] error quitando el curso de las estadísticas")
+
+def _write_snapshots(db, ops):
+    try:
+        db.studentStatistics.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # documento actualizado por una ruta durante la reconstrucción: el
+        # filtro no coincide, el upsert choca con el índice único y se conserva
+        if not only_duplicates(e):
+            raise
+
+def rebuild_student_statistics(db, chunk=500):
+    """
+    Reconstruye studentStatistics completo desde enrolledCourses y courses.
+    Los documentos que las rutas actualizan mientras corre no se pisan.
+    """
+    started = datetime.utcnow()
+    courses = {c["_id"]: c for c in db.courses.find({}, _COURSE_FIELDS)}
+    per_user = {}
+    for e in db.enrolledCourses.find({}, _ENROLLMENT_FIELDS):
+        course = courses.get(e["courseId"])
+        if not course or course.get("language") not in (False, True):
+            continue
+        key = (e["userId"], course["language"])
+        per_user.setdefault(key, {})[str(e["courseId"])] = course_contribution(e, course)
+
+    ops = []
+    for (user_oid, language), by_course in per_user.items():
+        ops.append(UpdateOne(
+            {"userId": user_oid, "language": language, "updatedAt": {"$not": {"$gt": started}}},
+            _full_update(by_course, started),
+            upsert=True
+        ))
+        if len(ops) >= chunk:
+            _write_snapshots(db, ops)
+            ops = []
+    if ops:
+        _write_snapshots(db, ops)
+
+    # documentos de usuarios que ya no tienen inscripciones en esa lengua
+    db.studentStatistics.delete_many({"updatedAt": {"$lt": started}})
+    return len(per_user)
+
+def language_stats_from_model(db, user_oid, user):
+    """
+    (lesco, libras) en el formato del perfil leyendo studentStatistics.
+    Cada lengua es None si el usuario todavía no tiene documento en ella.
+    """
+    docs = {
+        d["language"]: d.get("totals", {})
+        for d in db.studentStatistics.find({"userId": user_oid}, {"language": 1, "totals": 1})
+    }
+    info = (user or {}).get("information", {})
+
+    def build(language):
+        if language not in docs:
+            return None
+        t = docs[language]
+        attempt_count = t.get("attemptCount", 0)
+        return {
+            "coursesCompleted": t.get("coursesCompleted", 0),
+            "lessonsCompleted": t.get("lessons", 0),
+            "activitiesCompleted": t.get("activities", 0),
+            "averageAttempts": round(t.get("attemptsUsed", 0) / attempt_count, 1) if attempt_count > 0 else 0,
+            "level": info.get("librasLevel", 0) if language else info.get("lescoLevel", 0),
+            "skills": info.get("librasSkills", 0) if language else info.get("lescoSkills", 0)
+        }
+
+    return build(False), build(True)
@@ -0,0 +1,117 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime
+from pymongo import DeleteOne, ReplaceOne
+
+# ============================
+# Sugerencias de amigos
+# ============================
+# Se precalculan para todos los usuarios y se guardan en friendSuggestions:
+# { _id: userId, suggestions: [{ userId, score, mutual, sharedCourses }], count, computedAt }
+# El puntaje combina amigos de amigos (cuántos de mis seguidos siguen al
+# candidato) y cursos en común. Ambos son productos de matrices dispersas
+# (seguir x seguir, inscripción x inscripción^T) calculados con dicts de sets.
+
+SUGGESTIONS_MAX = 100        # sugerencias guardadas por usuario
+FOF_WEIGHT = 3               # peso de cada seguido en común
+COURSE_WEIGHT = 1            # peso de cada curso en común
+COURSE_MAX_MEMBERS = 2000    # cursos más grandes no aportan (evita pares n^2)
+WRITE_CHUNK = 500
+
+_logger = logging.getLogger("routes.suggestions")
+
+def _load_graph(db):
+    following = {}
+    for e in db.follows.find({}, {"follower": 1, "followee": 1, "_id": 0}):
+        following.setdefault(e["follower"], set()).add(e["followee"])
+
+    members = {}
+    courses = {}
+    for e in db.enrolledCourses.find({}, {"userId": 1, "courseId": 1, "_id": 0}):
+        members.setdefault(e["courseId"], set()).add(e["userId"])
+        courses.setdefault(e["userId"], set()).add(e["courseId"])
+    return following, members, courses
+
+def _suggestions_for(user_oid, following, members, courses):
+    mine = following.get(user_oid, set())
+    mutual = {}
+    for friend in mine:
+        for candidate in following.get(friend, ()):
+            mutual[candidate] = mutual.get(candidate, 0) + 1
+
+    shared = {}
+    for course in courses.get(user_oid, ()):
+        classmates = members.get(course, ())
+        if len(classmates) > COURSE_MAX_MEMBERS:
+            continue
+        for candidate in classmates:
+            shared[candidate] = shared.get(candidate, 0) + 1
+
+    scored = []
+    for candidate in set(mutual) | set(shared):
+        if candidate == user_oid or candidate in mine:
+            continue
+        m, c = mutual.get(candidate, 0), shared.get(candidate, 0)
+        scored.append((m * FOF_WEIGHT + c * COURSE_WEIGHT, m, c, candidate))
+
+    return [
+        {"userId": candidate, "score": score, "mutual": m, "sharedCourses": c}
+        for score, m, c, candidate in heapq.nlargest(SUGGESTIONS_MAX, scored, key=lambda x: x[:3])
+    ]
+
+def compute_friend_suggestions(db):
+    """Recalcula friendSuggestions para todos los usuarios. Devuelve cuántos procesó."""
+    following, members, courses = _load_graph(db)
+    now = datetime.utcnow()
+    ops = []
+    processed = 0
+    for u in db.users.find({}, {"_id": 1}):
+        suggestions = _suggestions_for(u["_id"], following, members, courses)
+        if suggestions:
+            ops.append(ReplaceOne(
+                {"_id": u["_id"]},
+                {"suggestions": suggestions, "count": len(suggestions), "computedAt": now},
+                upsert=True
+            ))
+        else:
+            # sin candidatos: sin documento, para que la ruta use su alternativa
+            ops.append(DeleteOne({"_id": u["_id"]}))
+        processed += 1
+        if len(ops) >= WRITE_CHUNK:
+            db.friendSuggestions.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        db.friendSuggestions.bulk_write(ops, ordered=False)
+    return processed
+
+def suggestion_page(db, user_oid, skip, limit):
+    """
+    Página de la lista precalculada: (sugerencias, total) o (None, 0) si el
+    usuario todavía no tiene lista o está vacía.
+    """
+    doc = db.friendSuggestions.find_one(
+        {"_id": user_oid},
+        {"suggestions": {"$slice": [skip, limit]}, "count": 1}
+    )
+    if not doc or not doc.get("count"):
+        return None, 0
+    return doc.get("suggestions", []), doc.get("count", 0)
+
+def init_app(app):
+    """Si FRIEND_SUGGESTIONS_INTERVAL_HOURS > 0 recalcula periódicamente en un hilo."""
+    hours = app.config.get("FRIEND_SUGGESTIONS_INTERVAL_HOURS", 0)
+    if not hours:
+        return
+
+    def run():
+        while True:
+            try:
+                processed = compute_friend_suggestions(app.db)
+                _logger.info(f"[suggestions] usuarios procesados: {processed}")
+            except Exception:
+                _logger.exception("[suggestions] error calculando sugerencias")
+            time.sleep(hours * 3600)
+
+    threading.Thread(target=run, name="friend-suggestions", daemon=True).start()
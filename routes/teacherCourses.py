@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, current_app, request
 from bson import ObjectId
 from datetime import datetime
+from routes.studentStatistics import safe_refresh_course_stats, safe_remove_course_stats
 import re
 
 teacher_courses_blueprint = Blueprint('teacher_courses', __name__)
@@ -77,6 +78,9 @@ def remove_student_from_course(course_id):
         if result.deleted_count == 0:
             return jsonify({'error': 'El estudiante no estaba inscrito en este curso'}), 404
         
+        # Quitar el curso de las estadísticas del estudiante
+        safe_refresh_course_stats(db, student_oid, course_oid)
+        
         return jsonify({'message': 'Estudiante eliminado del curso exitosamente'}), 200
         
     except Exception as e:
@@ -326,6 +330,7 @@ def delete_teacher_course():
         
         # También eliminar inscripciones relacionadas
         db.enrolledCourses.delete_many({'courseId': course_oid})
+        safe_remove_course_stats(db, course_oid, existing_course.get('language'))
         
         # ACTUALIZAR ESTADÍSTICAS - Decrementar cursos y lecciones
         update_teacher_statistics(db, teacher_id, courses_created=-1, lessons_created=-lessons_to_remove)
@@ -351,11 +356,20 @@ def get_course_students(course_id):
             return jsonify({'error': 'Curso no encontrado'}), 404
         
         # Obtener estudiantes inscritos en el curso
-        enrolled_students = db.enrolledCourses.find({'courseId': course_oid})
+        enrolled_students = list(db.enrolledCourses.find({'courseId': course_oid}))
+        
+        # Datos de todos los estudiantes en una sola consulta
+        students = {
+            s['_id']: s
+            for s in db.users.find(
+                {'_id': {'$in': [e['userId'] for e in enrolled_students]}},
+                {'name': 1, 'email': 1}
+            )
+        }
         
         students_list = []
         for enrollment in enrolled_students:
-            student = db.users.find_one({'_id': enrollment['userId']})
+            student = students.get(enrollment['userId'])
             if student:
                 student_data = {
                     'id': str(student['_id']),
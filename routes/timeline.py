@@ -0,0 +1,86 @@
+from routes.background import BatchWorker
+from routes.bulkInserts import insert_ignoring_duplicates
+from routes.follows import follower_ids, following_ids
+
+# ============================
+# Timelines (fan-out on write)
+# ============================
+# Cada noticia nueva se copia (solo referencias) a la colección `timelines`
+# de cada seguidor: { userId: dueño del feed, newsId, authorId, date }.
+# Así el feed es un rango del índice (userId, date, newsId).
+# Los autores con demasiados seguidores quedan marcados con fanoutOnRead
+# y sus noticias se leen directamente de `news` al armar el feed.
+# Los timelines de datos anteriores se arman una vez al arrancar
+# (routes/migrations.py); mientras tanto el feed de un usuario sin entradas
+# se lee de `news` igual que el de los autores fan-out on read.
+
+FANOUT_MAX_FOLLOWERS = 5000   # más seguidores => fan-out on read
+FANOUT_CHUNK = 1000           # tamaño de cada insert_many
+BACKFILL_LIMIT = 50           # noticias recientes que se copian al seguir a alguien
+
+def _insert_entries(db, entries):
+    for i in range(0, len(entries), FANOUT_CHUNK):
+        # índice único (userId, newsId): las entradas repetidas se ignoran
+        insert_ignoring_duplicates(db.timelines, entries[i:i + FANOUT_CHUNK])
+
+def _fanout_news(db, news_doc):
+    author = db.users.find_one({"_id": news_doc["userId"]}, {"followersCount": 1, "fanoutOnRead": 1}) or {}
+
+    # el autor siempre ve sus propias noticias
+    owners = [news_doc["userId"]]
+    if author.get("followersCount", 0) > FANOUT_MAX_FOLLOWERS:
+        if not author.get("fanoutOnRead"):
+            db.users.update_one({"_id": news_doc["userId"]}, {"$set": {"fanoutOnRead": True}})
+    else:
+        owners += follower_ids(db, news_doc["userId"])
+
+    _insert_entries(db, [
+        {"userId": owner, "newsId": news_doc["_id"], "authorId": news_doc["userId"], "date": news_doc["date"]}
+        for owner in owners
+    ])
+
+def _backfill(db, owner, author_id):
+    author = db.users.find_one({"_id": author_id}, {"fanoutOnRead": 1}) or {}
+    if author.get("fanoutOnRead"):
+        return
+    recent = db.news.find({"userId": author_id}, {"date": 1}).sort([("date", -1), ("_id", -1)]).limit(BACKFILL_LIMIT)
+    _insert_entries(db, [
+        {"userId": owner, "newsId": n["_id"], "authorId": author_id, "date": n["date"]}
+        for n in recent
+    ])
+
+def _handle_jobs(batch):
+    for job in batch:
+        kind, db = job[0], job[1]
+        if kind == "fanout":
+            _fanout_news(db, job[2])
+        elif kind == "backfill":
+            _backfill(db, job[2], job[3])
+
+_WORKER = BatchWorker("timeline-fanout", _handle_jobs, batch_size=50)
+
+def enqueue_fanout(db, news_doc):
+    """Reparte la noticia a los timelines de los seguidores (asíncrono)."""
+    _WORKER.submit(("fanout", db, {"_id": news_doc["_id"], "userId": news_doc["userId"], "date": news_doc["date"]}))
+
+def enqueue_backfill(db, owner, author_id):
+    """Copia las noticias recientes de author_id al timeline de owner (asíncrono)."""
+    _WORKER.submit(("backfill", db, owner, author_id))
+
+def remove_author(db, owner, author_id):
+    """Quita del timeline de owner las noticias de author_id (al dejar de seguir)."""
+    db.timelines.delete_many({"userId": owner, "authorId": author_id})
+
+def rebuild_user_timeline(db, owner, following_ids):
+    """Reconstruye el timeline de owner desde `news` (migración / reparación)."""
+    db.timelines.delete_many({"userId": owner})
+    for author_id in list(following_ids) + [owner]:
+        _backfill(db, owner, author_id)
+
+def rebuild_timelines(db):
+    """Reconstruye los timelines de todos los usuarios. Devuelve cuántos."""
+    count = 0
+    for u in db.users.find({}, {"_id": 1}):
+        rebuild_user_timeline(db, u["_id"], following_ids(db, u["_id"]))
+        count += 1
+    return count
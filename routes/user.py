@@ -1,6 +1,16 @@
 from flask import Blueprint, jsonify, current_app, request
 from bson import ObjectId
 from datetime import datetime
+from routes.timeline import enqueue_backfill, remove_author
+from routes.follows import (
+    add_follow, add_follows, follow_counts, follow_page, following_ids as get_following_ids,
+    migrate_follow_arrays, remove_follow
+)
+from routes.suggestions import compute_friend_suggestions, suggestion_page
+from routes.displayNames import display_name, fetch_user_names, resolve_user_names
+from routes.studentStatistics import language_stats_from_model, rebuild_student_statistics
+from routes.userSearch import rebuild_search_keys, search_users_by_name
+from routes.pagination import page_limit
 import re
 
 
@@ -24,17 +34,23 @@ def get_user_profile(user_id):
         # Obtener logros
         achievements = get_user_achievements(db, user)
         
-        # Obtener estadísticas por idioma
-        lesco_stats = get_language_stats(db, user_oid, language=False)  # 0 = LESCO
-        libras_stats = get_language_stats(db, user_oid, language=True)  # 1 = LIBRAS
+        # Obtener estadísticas por idioma desde studentStatistics
+        # (la lengua que aún no tenga documento se calcula desde las inscripciones)
+        lesco_stats, libras_stats = language_stats_from_model(db, user_oid, user)
+        if lesco_stats is None or libras_stats is None:
+            live_lesco, live_libras = get_language_stats(db, user_oid, user)
+            lesco_stats = live_lesco if lesco_stats is None else lesco_stats
+            libras_stats = live_libras if libras_stats is None else libras_stats
+        
+        followers_count, following_count = follow_counts(user)
         
         # Construir respuesta
         profile_data = {
             'user': {
                 'name': user.get('name', 'Usuario'),
                 'initials': get_initials(user.get('name', 'U')),
-                'followers': len(user.get('followers', [])),
-                'following': len(user.get('following', [])),
+                'followers': followers_count,
+                'following': following_count,
                 'level': calculate_actual_level(user),
                 'skillsProgress': calculate_current_skills(user),
                 'totalSkills': calculate_next_level_skills(user)
@@ -111,63 +127,73 @@ def get_achievement_value(achievement):
     numbers = re.findall(r'\d+', content)
     return int(numbers[0]) if numbers else 0
 
-def get_language_stats(db, user_id, language):
-    # Obtener cursos completados de la lengua
-    completed = db.enrolledCourses.find({'userId': user_id})
+def get_language_stats(db, user_id, user):
+    """
+    Estadísticas de LESCO (language False) y LIBRAS (language True) en una
+    sola pasada sobre las inscripciones. Devuelve (lesco, libras).
+    """
+    enrollments = list(db.enrolledCourses.find(
+        {'userId': user_id},
+        {'courseId': 1, 'completionDate': 1, 'completedLessons.lessonId': 1, 'completedLessons.remainingAttempts': 1}
+    ))
     
-    courses_completed = 0
-    lessons_completed = 0
-    activities_completed = 0
-    total_attempts = 0
-    attempt_count = 0
+    # Cursos de todas las inscripciones en una sola consulta
+    courses = {
+        c['_id']: c
+        for c in db.courses.find(
+            {'_id': {'$in': [e['courseId'] for e in enrollments]}},
+            {'language': 1, 'lessons._id': 1, 'lessons.questionCount': 1, 'lessons.attempts': 1}
+        )
+    }
     
-    for comp_course in completed:
-        course = db.courses.find_one({'_id': comp_course['courseId']})
-        # Se verifica que el curso este terminado y de la lengua que es
-        if comp_course.get('completionDate') is not None and course.get('language') == language:
-            courses_completed += 1
-            
-        if course.get('language') == language:
-            # Contar lecciones 
-            completed_lessons = comp_course.get('completedLessons', [])
-            lessons_completed += len(completed_lessons)
-            
-            for lesson in completed_lessons:
-                # Obtener la leccion con sus datos 
-                original_lesson = None
-                for l in course.get('lessons', []):
-                    if l['_id'] == lesson['lessonId']:
-                        original_lesson = l
-                        break  
-                
-                if original_lesson:
-                    activities_completed += original_lesson.get('questionCount', 0)
-                    
-                    # Calcular intentos
-                    max_attempts = original_lesson.get('attempts', 0)
-                    remaining = lesson.get('remainingAttempts', 0)
-                    used_attempts = max_attempts - remaining
-                    total_attempts += used_attempts
-                    attempt_count += 1
+    totals = {
+        language: {'courses': 0, 'lessons': 0, 'activities': 0, 'attempts': 0, 'attemptCount': 0}
+        for language in (False, True)
+    }
     
-    # Calcular promedio de intentos
-    average_attempts = round(total_attempts / attempt_count, 1) if attempt_count > 0 else 0
+    for comp_course in enrollments:
+        course = courses.get(comp_course['courseId'])
+        if not course or course.get('language') not in totals:
+            continue
+        t = totals[course['language']]
+        
+        # Se verifica que el curso este terminado
+        if comp_course.get('completionDate') is not None:
+            t['courses'] += 1
+        
+        # Contar lecciones 
+        completed_lessons = comp_course.get('completedLessons', [])
+        t['lessons'] += len(completed_lessons)
+        
+        lessons_by_id = {l['_id']: l for l in course.get('lessons', [])}
+        for lesson in completed_lessons:
+            # Obtener la leccion con sus datos 
+            original_lesson = lessons_by_id.get(lesson['lessonId'])
+            if original_lesson:
+                t['activities'] += original_lesson.get('questionCount', 0)
+                
+                # Calcular intentos
+                max_attempts = original_lesson.get('attempts', 0)
+                remaining = lesson.get('remainingAttempts', 0)
+                t['attempts'] += max_attempts - remaining
+                t['attemptCount'] += 1
     
-    # Obtener nivel y habilidades del usuario
-    user = db.users.find_one({'_id': user_id})
+    # Nivel y habilidades del usuario (ya cargado)
     info = user.get('information', {}) if user else {}
     
-    level = info.get('lescoLevel', 0) if not language else info.get('librasLevel', 0)
-    skills = info.get('lescoSkills', 0) if not language else info.get('librasSkills', 0)
+    def build(language):
+        t = totals[language]
+        return {
+            'coursesCompleted': t['courses'],
+            'lessonsCompleted': t['lessons'],
+            'activitiesCompleted': t['activities'],
+            # Calcular promedio de intentos
+            'averageAttempts': round(t['attempts'] / t['attemptCount'], 1) if t['attemptCount'] > 0 else 0,
+            'level': info.get('librasLevel', 0) if language else info.get('lescoLevel', 0),
+            'skills': info.get('librasSkills', 0) if language else info.get('lescoSkills', 0)
+        }
     
-    return {
-        'coursesCompleted': courses_completed,
-        'lessonsCompleted': lessons_completed,
-        'activitiesCompleted': activities_completed,
-        'averageAttempts': average_attempts,
-        'level': level,
-        'skills': skills
-    }
+    return build(False), build(True)
 
 # Iniciales para el avatar
 def get_initials(name):
@@ -228,38 +254,47 @@ def calculate_actual_level(user):
         return libras_level
 
 
+def follow_list_response(user_id, followers, with_ids):
+    """
+    Respuesta paginada (?limit=&cursor=) para las listas de seguidores/seguidos.
+    El total sale de los contadores del usuario.
+    """
+    db = current_app.db
+    user_oid = ObjectId(user_id)
+    key = 'followers' if followers else 'following'
+    
+    user = db.users.find_one({'_id': user_oid}, {'followersCount': 1, 'followingCount': 1})
+    if not user:
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+    
+    limit = page_limit(request.args.get('limit'))
+    try:
+        ids, next_cursor = follow_page(db, user_oid, followers, limit, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    names = resolve_user_names(db, ids)
+    users_list = []
+    for uid in ids:
+        if uid not in names:
+            continue
+        name = names[uid] or 'Usuario'
+        item = {'name': name, 'initials': get_initials(name)}
+        if with_ids:
+            item = {'id': str(uid), **item}
+        users_list.append(item)
+    
+    followers_count, following_count = follow_counts(user)
+    return jsonify({
+        key: users_list,
+        'total': followers_count if followers else following_count,
+        'nextCursor': next_cursor
+    }), 200
+
 @user_blueprint.route('/followers/<user_id>', methods=['GET'])
 def get_user_followers(user_id):
     try:
-        db = current_app.db
-        user_oid = ObjectId(user_id)
-        
-        user = db.users.find_one({'_id': user_oid})
-        if not user:
-            return jsonify({'error': 'Usuario no encontrado'}), 404
-        
-        followers_ids = user.get('followers', [])
-        
-        if not followers_ids:
-            return jsonify({'followers': []}), 200
-        
-        followers = db.users.find(
-            {'_id': {'$in': followers_ids}},
-            {'name': 1}  
-        )
-        
-        followers_list = [
-            {
-                'name': follower.get('name', 'Usuario'),
-                'initials': get_initials(follower.get('name', 'U'))
-            }
-            for follower in followers
-        ]
-        
-        return jsonify({
-            'followers': followers_list,
-        }), 200
-        
+        return follow_list_response(user_id, followers=True, with_ids=False)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
@@ -267,35 +302,7 @@ def get_user_followers(user_id):
 @user_blueprint.route('/following/<user_id>', methods=['GET'])
 def get_user_following(user_id):
     try:
-        db = current_app.db
-        user_oid = ObjectId(user_id)
-        
-        user = db.users.find_one({'_id': user_oid})
-        if not user:
-            return jsonify({'error': 'Usuario no encontrado'}), 404
-
-        following_ids = user.get('following', [])
-
-        if not following_ids:
-            return jsonify({'following': []}), 200
-
-        followings = db.users.find(
-            {'_id': {'$in': following_ids}},
-            {'name': 1}  
-        )
-
-        following_list = [
-            {
-                'name': following.get('name', 'Usuario'),
-                'initials': get_initials(following.get('name', 'U'))
-            }
-            for following in followings
-        ]
-        
-        return jsonify({
-            'following': following_list,
-        }), 200
-        
+        return follow_list_response(user_id, followers=False, with_ids=False)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -304,38 +311,10 @@ def get_user_following(user_id):
 def get_user_followers_list(user_id):
     """
     Obtiene la lista de seguidores CON sus IDs para poder gestionarlos
+    GET /api/profile/followers-list/<user_id>?limit=20&cursor=<nextCursor>
     """
     try:
-        db = current_app.db
-        user_oid = ObjectId(user_id)
-        
-        user = db.users.find_one({'_id': user_oid})
-        if not user:
-            return jsonify({'error': 'Usuario no encontrado'}), 404
-        
-        followers_ids = user.get('followers', [])
-        
-        if not followers_ids:
-            return jsonify({'followers': []}), 200
-        
-        followers = db.users.find(
-            {'_id': {'$in': followers_ids}},
-            {'name': 1}  
-        )
-        
-        followers_list = [
-            {
-                'id': str(follower['_id']),
-                'name': follower.get('name', 'Usuario'),
-                'initials': get_initials(follower.get('name', 'U'))
-            }
-            for follower in followers
-        ]
-        
-        return jsonify({
-            'followers': followers_list,
-        }), 200
-        
+        return follow_list_response(user_id, followers=True, with_ids=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -344,38 +323,10 @@ def get_user_followers_list(user_id):
 def get_user_following_list(user_id):
     """
     Obtiene la lista de seguidos CON sus IDs para poder gestionarlos
+    GET /api/profile/following-list/<user_id>?limit=20&cursor=<nextCursor>
     """
     try:
-        db = current_app.db
-        user_oid = ObjectId(user_id)
-        
-        user = db.users.find_one({'_id': user_oid})
-        if not user:
-            return jsonify({'error': 'Usuario no encontrado'}), 404
-
-        following_ids = user.get('following', [])
-
-        if not following_ids:
-            return jsonify({'following': []}), 200
-
-        followings = db.users.find(
-            {'_id': {'$in': following_ids}},
-            {'name': 1}  
-        )
-
-        following_list = [
-            {
-                'id': str(following['_id']),
-                'name': following.get('name', 'Usuario'),
-                'initials': get_initials(following.get('name', 'U'))
-            }
-            for following in followings
-        ]
-        
-        return jsonify({
-            'following': following_list,
-        }), 200
-        
+        return follow_list_response(user_id, followers=False, with_ids=True)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -401,38 +352,29 @@ def remove_follower():
         if user_id == follower_id:
             return jsonify({'error': 'No puedes eliminarte a ti mismo'}), 400
         
-        # Verificar que ambos usuarios existen
-        user = db.users.find_one({'_id': user_id})
-        follower = db.users.find_one({'_id': follower_id})
+        # Verificar que ambos usuarios existen (una sola consulta, sin la cache de nombres)
+        names = fetch_user_names(db, [user_id, follower_id])
         
-        if not user:
+        if user_id not in names:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
-        if not follower:
+        if follower_id not in names:
             return jsonify({'error': 'Seguidor no encontrado'}), 404
+        follower_name = names[follower_id] or 'Usuario'
         
-        # Verificar si realmente es un seguidor
-        if follower_id not in user.get('followers', []):
+        # Eliminar la relación (si no existe, no es un seguidor)
+        if not remove_follow(db, follower_id, user_id):
             return jsonify({'error': 'Este usuario no es tu seguidor'}), 400
         
-        # Remover follower_id de la lista de followers del usuario
-        db.users.update_one(
-            {'_id': user_id},
-            {'$pull': {'followers': follower_id}}
-        )
-        
-        # Remover user_id de la lista de following del seguidor
-        db.users.update_one(
-            {'_id': follower_id},
-            {'$pull': {'following': user_id}}
-        )
+        # Quitar del feed del seguidor las noticias del usuario
+        remove_author(db, follower_id, user_id)
         
         return jsonify({
             'message': 'Seguidor eliminado exitosamente',
             'removed': {
                 'id': str(follower_id),
-                'name': follower.get('name', 'Usuario'),
-                'initials': get_initials(follower.get('name', 'U'))
+                'name': follower_name,
+                'initials': get_initials(follower_name)
             }
         }), 200
         
@@ -441,40 +383,59 @@ def remove_follower():
 
 @user_blueprint.route('/add-friends/<user_id>', methods=['GET'])
 def add_friends(user_id):
+    """
+    GET /api/profile/add-friends/<user_id>?page=1&limit=20
+    Sugerencias precalculadas (amigos de amigos y cursos en común), paginadas.
+    """
     try:
         db = current_app.db
         user_oid = ObjectId(user_id)
+        limit = page_limit(request.args.get('limit'))
+        try:
+            page = max(1, int(request.args.get('page', 1)))
+        except ValueError:
+            return jsonify({'error': 'page inválido'}), 400
         
         # Obtener información del usuario actual
-        user = db.users.find_one({'_id': user_oid})
+        user = db.users.find_one({'_id': user_oid}, {'_id': 1})
         if not user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
 
-        # Obtener IDs de usuarios que ya sigue
-        following_ids = user.get('following', [])
+        # Los seguidos desde el último cálculo se filtran al leer
+        following = set(get_following_ids(db, user_oid))
         
-        # Crear lista de IDs a excluir (el usuario mismo + los que ya sigue)
-        exclude_ids = following_ids + [user_oid]
+        suggestions, total = suggestion_page(db, user_oid, (page - 1) * limit, limit)
+        if suggestions is None:
+            # Sin lista precalculada (o vacía): cualquier usuario no seguido, acotado
+            exclude_ids = list(following) + [user_oid]
+            suggestions = [
+                {'userId': u['_id'], 'score': 0, 'mutual': 0, 'sharedCourses': 0}
+                for u in db.users.find({'_id': {'$nin': exclude_ids}}, {'_id': 1})
+                .skip((page - 1) * limit).limit(limit)
+            ]
+            total = None
+        suggestions = [sg for sg in suggestions if sg['userId'] not in following]
         
-        # Buscar todos los usuarios EXCEPTO los que ya sigue y él mismo
-        potential_friends = db.users.find(
-            {'_id': {'$nin': exclude_ids}},  
-            {'name': 1}
-        )
+        names = resolve_user_names(db, [sg['userId'] for sg in suggestions])
         
-        # Construir lista de posibles amigos
+        # Construir lista de posibles amigos (solo usuarios que siguen existiendo)
         friends_list = [
             {
-                'id': str(friend['_id']),
-                'name': friend.get('name', 'Usuario'),
-                'initials': get_initials(friend.get('name', 'U'))
+                'id': str(sg['userId']),
+                'name': names[sg['userId']] or 'Usuario',
+                'initials': get_initials(names[sg['userId']] or 'U'),
+                'mutualFriends': sg.get('mutual', 0),
+                'sharedCourses': sg.get('sharedCourses', 0)
             }
-            for friend in potential_friends
+            for sg in suggestions if sg['userId'] in names
         ]
         
         return jsonify({
             'potentialFriends': friends_list,
-            'count': len(friends_list)
+            'count': len(friends_list),
+            'page': page,
+            'limit': limit,
+            'hasMore': (page * limit < total) if total is not None else len(suggestions) == limit
         }), 200
         
     except Exception as e:
@@ -497,38 +458,30 @@ def follow_user():
         if user_id == follow_id:
             return jsonify({'error': 'No puedes seguirte a ti mismo'}), 400
         
-        # Verificar que ambos usuarios existen
-        user = db.users.find_one({'_id': user_id})
-        user_to_follow = db.users.find_one({'_id': follow_id})
+        # Verificar que ambos usuarios existen y traer sus nombres (una sola
+        # consulta, sin la cache: no se debe poder seguir a un usuario recién borrado)
+        names = fetch_user_names(db, [user_id, follow_id])
         
-        if not user:
+        if user_id not in names:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
-        if not user_to_follow:
+        if follow_id not in names:
             return jsonify({'error': 'Usuario a seguir no encontrado'}), 404
+        follow_name = names[follow_id] or 'Usuario'
         
-        # Verificar si ya lo sigue
-        if follow_id in user.get('following', []):
+        # Crear la relación (el índice único evita duplicados)
+        if not add_follow(db, user_id, follow_id):
             return jsonify({'error': 'Ya sigues a este usuario'}), 400
         
-        # Agregar follow_id a la lista de following del usuario
-        db.users.update_one(
-            {'_id': user_id},
-            {'$addToSet': {'following': follow_id}}  # $addToSet evita duplicados
-        )
-        
-        # Agregar user_id a la lista de followers del usuario seguido
-        db.users.update_one(
-            {'_id': follow_id},
-            {'$addToSet': {'followers': user_id}}
-        )
+        # Traer al feed las noticias recientes del usuario seguido
+        enqueue_backfill(db, user_id, follow_id)
         
         return jsonify({
             'message': 'Usuario seguido exitosamente',
             'following': {
                 'id': str(follow_id),
-                'name': user_to_follow.get('name', 'Usuario'),
-                'initials': get_initials(user_to_follow.get('name', 'U'))
+                'name': follow_name,
+                'initials': get_initials(follow_name)
             }
         }), 200
         
@@ -536,6 +489,73 @@ def follow_user():
         return jsonify({'error': str(e)}), 500
 
 
+FOLLOW_BATCH_MAX = 500
+
+@user_blueprint.route('/follow-batch', methods=['POST'])
+def follow_users_batch():
+    """
+    Sigue a varios usuarios de una vez (p. ej. toda una clase al empezar).
+    Body: { userId, followIds: [...] } o { userId, courseId } para seguir al
+    profesor y a los estudiantes del curso.
+    """
+    try:
+        db = current_app.db
+        data = request.get_json()
+        
+        # Validar datos
+        if not data or 'userId' not in data or not ('followIds' in data or 'courseId' in data):
+            return jsonify({'error': 'Se requieren userId y followIds o courseId'}), 400
+        
+        user_id = ObjectId(data['userId'])
+        
+        if 'courseId' in data:
+            course = db.courses.find_one({'_id': ObjectId(data['courseId'])}, {'userId': 1, 'students': 1})
+            if not course:
+                return jsonify({'error': 'Curso no encontrado'}), 404
+            candidates = [course.get('userId')] + list(course.get('students') or [])
+        else:
+            if not isinstance(data['followIds'], list):
+                return jsonify({'error': 'followIds debe ser una lista'}), 400
+            if not all(isinstance(x, str) and ObjectId.is_valid(x) for x in data['followIds']):
+                return jsonify({'error': 'followIds contiene ids inválidos'}), 400
+            candidates = [ObjectId(x) for x in data['followIds']]
+        
+        candidates = [c for c in dict.fromkeys(candidates) if c and c != user_id]
+        if len(candidates) > FOLLOW_BATCH_MAX:
+            return jsonify({'error': f'Máximo {FOLLOW_BATCH_MAX} usuarios por solicitud'}), 400
+        
+        # Verificar existencia y traer nombres de todos en una sola consulta, sin
+        # pasar por la cache de nombres (un usuario borrado seguiría en ella unos minutos)
+        names = fetch_user_names(db, [user_id] + candidates)
+        if user_id not in names:
+            return jsonify({'error': 'Usuario no encontrado'}), 404
+        existing = [c for c in candidates if c in names]
+        
+        # Relaciones en un solo bulk_write; contadores en otro
+        added = add_follows(db, user_id, existing)
+        
+        # Traer al feed las noticias recientes de cada nuevo seguido
+        for follow_id in added:
+            enqueue_backfill(db, user_id, follow_id)
+        
+        return jsonify({
+            'message': 'Usuarios seguidos exitosamente',
+            'following': [
+                {
+                    'id': str(f),
+                    'name': names[f] or 'Usuario',
+                    'initials': get_initials(names[f] or 'U')
+                }
+                for f in added
+            ],
+            'alreadyFollowing': len(existing) - len(added),
+            'notFound': len(candidates) - len(existing)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @user_blueprint.route('/unfollow', methods=['POST'])
 def unfollow_user():
     try:
@@ -553,38 +573,29 @@ def unfollow_user():
         if user_id == unfollow_id:
             return jsonify({'error': 'No puedes dejar de seguirte a ti mismo'}), 400
         
-        # Verificar que ambos usuarios existen
-        user = db.users.find_one({'_id': user_id})
-        user_to_unfollow = db.users.find_one({'_id': unfollow_id})
+        # Verificar que ambos usuarios existen (una sola consulta, sin la cache de nombres)
+        names = fetch_user_names(db, [user_id, unfollow_id])
         
-        if not user:
+        if user_id not in names:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
-        if not user_to_unfollow:
+        if unfollow_id not in names:
             return jsonify({'error': 'Usuario a dejar de seguir no encontrado'}), 404
+        unfollow_name = names[unfollow_id] or 'Usuario'
         
-        # Verificar si realmente lo sigue
-        if unfollow_id not in user.get('following', []):
+        # Eliminar la relación (si no existe, no lo sigue)
+        if not remove_follow(db, user_id, unfollow_id):
             return jsonify({'error': 'No sigues a este usuario'}), 400
         
-        # Remover unfollow_id de la lista de following del usuario
-        db.users.update_one(
-            {'_id': user_id},
-            {'$pull': {'following': unfollow_id}}  # $pull remueve el elemento
-        )
-        
-        # Remover user_id de la lista de followers del usuario
-        db.users.update_one(
-            {'_id': unfollow_id},
-            {'$pull': {'followers': user_id}}
-        )
+        # Quitar del feed sus noticias
+        remove_author(db, user_id, unfollow_id)
         
         return jsonify({
             'message': 'Dejaste de seguir al usuario exitosamente',
             'unfollowed': {
                 'id': str(unfollow_id),
-                'name': user_to_unfollow.get('name', 'Usuario'),
-                'initials': get_initials(user_to_unfollow.get('name', 'U'))
+                'name': unfollow_name,
+                'initials': get_initials(unfollow_name)
             }
         }), 200
         
@@ -596,7 +607,7 @@ def get_teacher_profile(user_id):
     try:
         db = current_app.db
         user_oid = ObjectId(user_id)
-        user = db.users.find_one({'_id': user_oid})
+        user = db.users.find_one({'_id': user_oid}, {'name': 1, 'type': 1, 'followersCount': 1, 'followingCount': 1})
         if not user:
             return jsonify({'error': 'Profesor no encontrado'}), 404
         
@@ -604,11 +615,13 @@ def get_teacher_profile(user_id):
         if user.get('type') != True:
             return jsonify({'error': 'El usuario no es un profesor'}), 400
         
+        followers_count, following_count = follow_counts(user)
+        
         profile_data = {
             'name': user.get('name', 'Profesor'),
             'initials': get_initials(user.get('name', 'P')),
-            'followers': len(user.get('followers', [])),
-            'following': len(user.get('following', []))
+            'followers': followers_count,
+            'following': following_count
         }
         
         return jsonify(profile_data), 200
@@ -635,36 +648,29 @@ def search_users(user_id):
         user_oid = ObjectId(user_id)
         
         # Obtener usuario actual para excluir a quienes ya sigue
-        user = db.users.find_one({'_id': user_oid})
+        user = db.users.find_one({'_id': user_oid}, {'_id': 1})
         if not user:
             return jsonify({'error': 'Usuario no encontrado'}), 404
         
         # Obtener IDs de usuarios que ya sigue
-        following_ids = user.get('following', [])
+        following_ids = get_following_ids(db, user_oid)
         
         # Crear lista de IDs a excluir (el usuario mismo + los que ya sigue)
         exclude_ids = following_ids + [user_oid]
         
-        # Buscar usuarios por nombre (case insensitive) usando regex
-        # $regex permite búsqueda por coincidencias parciales
-        # $options: 'i' hace la búsqueda case-insensitive
-        search_results = db.users.find(
-            {
-                '_id': {'$nin': exclude_ids},  # Excluir usuarios que ya sigue y él mismo
-                'name': {'$regex': search_query, '$options': 'i'}  # Búsqueda por nombre
-            },
-            {'name': 1}  # Solo traer el campo name
-        ).limit(20)  # Limitar a 20 resultados para no sobrecargar
+        # Búsqueda por prefijo sobre el nombre normalizado (índice searchTokens),
+        # con trigramas como respaldo para errores de tipeo
+        search_results = search_users_by_name(db, search_query, exclude_ids, limit=20)
         
         # Construir lista de resultados
-        users_list = [
-            {
-                'id': str(user['_id']),
-                'name': user.get('name', 'Usuario'),
-                'initials': get_initials(user.get('name', 'U'))
-            }
-            for user in search_results
-        ]
+        users_list = []
+        for found, _score in search_results:
+            name = display_name(found) or 'Usuario'
+            users_list.append({
+                'id': str(found['_id']),
+                'name': name,
+                'initials': get_initials(name)
+            })
         
         return jsonify({
             'users': users_list,
@@ -672,4 +678,36 @@ def search_users(user_id):
         }), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+
+# ============================
+# Comandos de mantenimiento
+# ============================
+# flask user migrate-follows
+# flask user compute-suggestions
+# flask user rebuild-search-keys
+# flask user rebuild-student-statistics
+@user_blueprint.cli.command('migrate-follows')
+def migrate_follows():
+    """Mueve los arrays followers/following de users a la colección follows."""
+    migrated = migrate_follow_arrays(current_app.db)
+    print(f"Usuarios migrados: {migrated}")
+
+@user_blueprint.cli.command('compute-suggestions')
+def compute_suggestions():
+    """Recalcula la lista de sugerencias de amigos de cada usuario."""
+    processed = compute_friend_suggestions(current_app.db)
+    print(f"Usuarios procesados: {processed}")
+
+@user_blueprint.cli.command('rebuild-search-keys')
+def rebuild_user_search_keys():
+    """Recalcula searchTokens/searchGrams (nombre normalizado) de todos los usuarios."""
+    updated = rebuild_search_keys(current_app.db)
+    print(f"Usuarios actualizados: {updated}")
+
+@user_blueprint.cli.command('rebuild-student-statistics')
+def rebuild_student_stats():
+    """Reconstruye studentStatistics desde enrolledCourses y courses."""
+    rebuilt = rebuild_student_statistics(current_app.db)
+    print(f"Documentos de estadísticas: {rebuilt}")
@@ -0,0 +1,155 @@
+import logging
+import re
+import threading
+import unicodedata
+from pymongo import UpdateOne
+from routes.displayNames import display_name
+
+# ============================
+# Búsqueda de usuarios por nombre
+# ============================
+# Cada usuario guarda su nombre normalizado (minúsculas, sin acentos):
+#   searchTokens: palabras del nombre     -> índice para búsqueda por prefijo
+#   searchGrams:  trigramas de las palabras -> índice para tolerar errores
+# Las consultas usan regex anclados (^prefijo) sobre searchTokens, que el
+# índice puede resolver como un rango. Cualquier escritura de name,
+# firstName o lastName debe llamar a update_search_keys(). Como los nombres
+# también se escriben fuera de la API, las claves que falten se calculan al
+# arrancar (SEARCH_KEYS_BACKFILL_ON_STARTUP) y en /sync-user; la búsqueda
+# nunca recorre la colección completa.
+
+SEARCH_CANDIDATES = 200   # candidatos que se leen antes de ordenar
+GRAM_MIN_QUERY = 4        # largo mínimo de palabra para buscar por trigramas
+GRAM_MIN_SIMILARITY = 0.4
+
+_NAME_FIELDS = {"name": 1, "firstName": 1, "lastName": 1}
+# sin claves calculadas (se resuelve con el índice de searchTokens)
+MISSING_KEYS = {"searchTokens": {"$exists": False}}
+
+_logger = logging.getLogger("routes.userSearch")
+
+def fold(text):
+    """Minúsculas, sin acentos y solo letras/números separados por espacios."""
+    text = unicodedata.normalize("NFKD", text or "").lower()
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+def tokenize(text):
+    return fold(text).split()
+
+def trigrams(tokens):
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _similarity(query_tokens, user_tokens):
+    """Promedio, por palabra de la consulta, del mejor Jaccard de trigramas."""
+    if not user_tokens:
+        return 0
+    total = 0
+    for q in query_tokens:
+        qg = trigrams([q])
+        total += max(len(qg & trigrams([t])) / len(qg | trigrams([t])) for t in user_tokens)
+    return total / len(query_tokens)
+
+def search_keys(user_doc):
+    """Campos de búsqueda para un documento de usuario."""
+    user_doc = user_doc or {}
+    tokens = []
+    for field in ("name", "firstName", "lastName"):
+        for token in tokenize(user_doc.get(field)):
+            if token not in tokens:
+                tokens.append(token)
+    return {"searchTokens": tokens, "searchGrams": sorted(trigrams(tokens))}
+
+def update_search_keys(db, user_oid):
+    user = db.users.find_one({"_id": user_oid}, _NAME_FIELDS)
+    if user:
+        db.users.update_one({"_id": user_oid}, {"$set": search_keys(user)})
+
+def rebuild_search_keys(db, chunk=1000, query=None):
+    """Recalcula searchTokens/searchGrams de los usuarios de `query` (todos por defecto)."""
+    ops = []
+    updated = 0
+    for u in db.users.find(query or {}, _NAME_FIELDS):
+        ops.append(UpdateOne({"_id": u["_id"]}, {"$set": search_keys(u)}))
+        if len(ops) >= chunk:
+            db.users.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        db.users.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    return updated
+
+def _prefix_score(query_tokens, user_tokens):
+    """Exacta 3, prefijo 2 por palabra de la consulta; None si alguna no coincide."""
+    score = 0
+    for q in query_tokens:
+        best = 0
+        for t in user_tokens:
+            if t == q:
+                best = 3
+                break
+            if t.startswith(q):
+                best = 2
+        if not best:
+            return None
+        score += best
+    # bonus si el nombre empieza con la consulta
+    if len(user_tokens) >= len(query_tokens) and all(
+        t.startswith(q) for q, t in zip(query_tokens, user_tokens)
+    ):
+        score += 1
+    return score
+
+def search_users_by_name(db, query, exclude_ids, limit=20):
+    """
+    Usuarios cuyo nombre coincide con `query` ordenados por relevancia:
+    coincidencias exactas y por prefijo primero, luego parecidas por trigramas.
+    Devuelve [(documento, puntaje)].
+    """
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return []
+    base = {"_id": {"$nin": list(exclude_ids)}}
+    projection = {**_NAME_FIELDS, "searchTokens": 1, "email": 1}
+
+    ranked = {}
+    prefix_query = {**base, "$and": [
+        {"searchTokens": {"$regex": f"^{re.escape(q)}"}} for q in query_tokens
+    ]}
+    for u in db.users.find(prefix_query, projection).limit(SEARCH_CANDIDATES):
+        score = _prefix_score(query_tokens, u.get("searchTokens") or [])
+        if score is not None:
+            ranked[u["_id"]] = (u, 10 + score)
+
+    # tolerancia a errores de tipeo
+    if len(ranked) < limit and max(len(q) for q in query_tokens) >= GRAM_MIN_QUERY:
+        q_grams = trigrams(query_tokens)
+        gram_query = {**base, "_id": {"$nin": list(exclude_ids) + list(ranked)},
+                      "searchGrams": {"$in": sorted(q_grams)}}
+        for u in db.users.find(gram_query, projection).limit(SEARCH_CANDIDATES):
+            similarity = _similarity(query_tokens, u.get("searchTokens") or [])
+            if similarity >= GRAM_MIN_SIMILARITY:
+                ranked[u["_id"]] = (u, similarity * 10)
+
+    results = sorted(ranked.values(), key=lambda x: (-x[1], display_name(x[0]) or ""))
+    return results[:limit]
+
+def init_app(app):
+    """Si SEARCH_KEYS_BACKFILL_ON_STARTUP, calcula en un hilo las claves que falten."""
+    if not app.config.get("SEARCH_KEYS_BACKFILL_ON_STARTUP", True):
+        return
+
+    def run():
+        try:
+            updated = rebuild_search_keys(app.db, query=MISSING_KEYS)
+            if updated:
+                _logger.info(f"[userSearch] usuarios con claves nuevas: {updated}")
+        except Exception:
+            _logger.exception("[userSearch] error calculando claves de búsqueda")
+
+    threading.Thread(target=run, name="search-keys-backfill", daemon=True).start()
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from routes.indexes import ensure_indexes, plan_stages
+from routes.news import FEED_NEWS_SORT, FEED_TIMELINE_SORT, _feed_queries
+from routes.pagination import encode_cursor
+
+# Los planes del feed deben resolverse con los índices compuestos, sin SORT en
+# memoria. Necesita un mongod en localhost; si no hay, se omite.
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient("mongodb://localhost:27017/", serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip("mongod no disponible en localhost:27017")
+    name = f"LEARN_TEST_{ObjectId()}"
+    database = client[name]
+    ensure_indexes(database)
+    yield database
+    client.drop_database(name)
+    client.close()
+
+@pytest.fixture(scope="module")
+def feed_data(db):
+    owner, authors = ObjectId(), [ObjectId() for _ in range(5)]
+    now = datetime.utcnow()
+    news = [
+        {"_id": ObjectId(), "userId": authors[i % 5], "title": "t", "date": now - timedelta(minutes=i)}
+        for i in range(200)
+    ]
+    db.news.insert_many(news)
+    db.timelines.insert_many([
+        {"userId": owner, "newsId": n["_id"], "authorId": n["userId"], "date": n["date"]} for n in news
+    ])
+    return owner, authors, news[50]
+
+def _stages(cursor):
+    return plan_stages(cursor.explain()["queryPlanner"]["winningPlan"])
+
+@pytest.mark.parametrize("paged", [False, True])
+def test_feed_queries_use_index_order(db, feed_data, paged):
+    owner, authors, middle = feed_data
+    cursor = encode_cursor(middle["date"], middle["_id"]) if paged else None
+    tq, pq = _feed_queries(owner, authors[:2], cursor)
+
+    timeline_stages = _stages(db.timelines.find(tq).sort(FEED_TIMELINE_SORT).limit(20))
+    news_stages = _stages(db.news.find(pq).sort(FEED_NEWS_SORT).limit(20))
+
+    assert "SORT" not in timeline_stages and "COLLSCAN" not in timeline_stages
+    assert "SORT" not in news_stages and "COLLSCAN" not in news_stages
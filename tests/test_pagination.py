@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from routes.news import _feed_queries
+from routes.pagination import decode_cursor, encode_cursor, keyset_filter, page_limit
+
+# Cursor y predicado de rango del feed, sin base de datos: el predicado se
+# evalúa en Python sobre filas ordenadas igual que en los índices.
+
+def _matches(predicate, row):
+    """Evalúa un filtro {$or: [{campo: {$lt|$gt: v}}, {campo: v, campo2: {...}}]}."""
+    def match_clause(clause):
+        for field, cond in clause.items():
+            if isinstance(cond, dict):
+                (op, value), = cond.items()
+                if not (row[field] < value if op == "$lt" else row[field] > value):
+                    return False
+            elif row[field] != cond:
+                return False
+        return True
+    return any(match_clause(c) for c in predicate["$or"])
+
+def _rows(count=30):
+    # fechas repetidas de a tres para ejercitar el desempate por _id
+    base = datetime(2024, 5, 1, 12, 0, 0, 123000)
+    return [{"date": base - timedelta(minutes=i // 3), "_id": ObjectId()} for i in range(count)]
+
+def test_cursor_round_trip():
+    date, oid = datetime(2024, 5, 1, 12, 30, 15, 250000), ObjectId()
+    cursor = encode_cursor(date, oid)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (date, oid)
+
+@pytest.mark.parametrize("cursor", ["", "nope", "bm90LWEtY3Vyc29y", encode_cursor(datetime(2024, 1, 1), ObjectId())[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_keyset_pages_cover_all_rows_once(descending):
+    rows = sorted(_rows(), key=lambda r: (r["date"], r["_id"]), reverse=descending)
+    seen, remaining, limit = [], rows, 7
+    while remaining:
+        page = remaining[:limit]
+        seen += page
+        last = page[-1]
+        predicate = keyset_filter(encode_cursor(last["date"], last["_id"]), "date", descending=descending)
+        remaining = [r for r in rows if _matches(predicate, r)]
+        assert remaining == rows[len(seen):]
+    assert seen == rows
+
+def test_keyset_filter_id_field():
+    date, oid = datetime(2024, 5, 1), ObjectId()
+    predicate = keyset_filter(encode_cursor(date, oid), "date", id_field="newsId")
+    assert predicate == {"$or": [{"date": {"$lt": date}}, {"date": date, "newsId": {"$lt": oid}}]}
+
+def test_feed_queries():
+    owner, authors = ObjectId(), [ObjectId(), ObjectId()]
+    date, oid = datetime(2024, 5, 1), ObjectId()
+    cursor = encode_cursor(date, oid)
+
+    tq, pq = _feed_queries(owner, [])
+    assert tq == {"userId": owner} and pq is None
+
+    tq, pq = _feed_queries(owner, authors, cursor)
+    assert tq == {"userId": owner, **keyset_filter(cursor, "date", id_field="newsId")}
+    assert pq == {"userId": {"$in": authors}, **keyset_filter(cursor, "date")}
+
+    with pytest.raises(ValueError):
+        _feed_queries(owner, authors, "nope")
+
+@pytest.mark.parametrize("value, expected", [(None, 20), ("5", 5), ("0", 1), ("500", 50), ("x", 20)])
+def test_page_limit(value, expected):
+    assert page_limit(value) == expected